@@ -8,10 +8,19 @@
 
 import os
 import asyncio
+import contextvars
+import copy
+import hashlib
+import hmac
+import json
 import logging
 import sqlite3
+import heapq
 import html
 import re
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from aiogram import Bot, Dispatcher, Router, F
@@ -19,11 +28,13 @@ from aiogram.types import (
     Message, CallbackQuery, InlineKeyboardButton, 
     InlineKeyboardMarkup, BotCommand, ReplyKeyboardRemove
 )
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 import aiohttp
+from aiohttp import web
 from dotenv import load_dotenv
 
 # Загрузка конфига
@@ -42,6 +53,61 @@ class Config:
     GLPI_USER_TOKEN = os.getenv("GLPI_USER_TOKEN")
     GLPI_MY_ID = int(os.getenv("GLPI_MY_ID", "21"))
     CHECK_INTERVAL = int(os.getenv("GLPI_CHECK_INTERVAL", "300"))
+    # Пул соединений к GLPI: лимит на хост, keep-alive (сек), TTL DNS-кэша (сек)
+    GLPI_POOL_SIZE = int(os.getenv("GLPI_POOL_SIZE", "10"))
+    GLPI_KEEPALIVE = int(os.getenv("GLPI_KEEPALIVE", "60"))
+    GLPI_DNS_TTL = int(os.getenv("GLPI_DNS_TTL", "300"))
+    # Кэш имён User/Location/Entity (макс. записей в памяти)
+    NAME_CACHE_SIZE = int(os.getenv("GLPI_NAME_CACHE_SIZE", "2000"))
+    # Отметки «уже уведомляли» (согласования/тикеты): записей в памяти (остальное — в SQLite)
+    DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "5000"))
+    # Макс. число тикетов, дозаполняемых параллельно
+    GLPI_MAX_CONCURRENCY = int(os.getenv("GLPI_MAX_CONCURRENCY", "8"))
+    # Между полными сверками монитор запрашивает только изменённые тикеты (date_mod)
+    FULL_SYNC_INTERVAL = int(os.getenv("GLPI_FULL_SYNC_INTERVAL", "3600"))
+    # Объектов на один запрос getMultipleItems / поиск по списку ID
+    GLPI_BATCH_SIZE = int(os.getenv("GLPI_BATCH_SIZE", "50"))
+    # Пагинация list/search: строк на страницу и сколько страниц запрашивать заранее
+    GLPI_PAGE_SIZE = int(os.getenv("GLPI_PAGE_SIZE", "100"))
+    GLPI_PREFETCH = int(os.getenv("GLPI_PREFETCH", "2"))
+    # Ограничение нагрузки на GLPI: запросов/сек (0 — без лимита), размер всплеска,
+    # одновременных запросов всего и из них — фоновым мониторингом
+    GLPI_RATE_LIMIT = float(os.getenv("GLPI_RATE_LIMIT", "10"))
+    GLPI_RATE_BURST = int(os.getenv("GLPI_RATE_BURST", "20"))
+    GLPI_MAX_IN_FLIGHT = int(os.getenv("GLPI_MAX_IN_FLIGHT", "6"))
+    GLPI_BACKGROUND_IN_FLIGHT = int(os.getenv("GLPI_BACKGROUND_IN_FLIGHT", "4"))
+    # Таймаут одного запроса к GLPI (сек) и circuit breaker: отказов подряд до
+    # размыкания, начальная и максимальная пауза перед пробным запросом (сек)
+    GLPI_TIMEOUT = float(os.getenv("GLPI_TIMEOUT", "15"))
+    GLPI_BREAKER_THRESHOLD = int(os.getenv("GLPI_BREAKER_THRESHOLD", "5"))
+    GLPI_BREAKER_COOLDOWN = float(os.getenv("GLPI_BREAKER_COOLDOWN", "30"))
+    GLPI_BREAKER_MAX_COOLDOWN = float(os.getenv("GLPI_BREAKER_MAX_COOLDOWN", "600"))
+    # Адаптивный опрос тикетов: как часто перепроверять «горячие» (недавно
+    # изменённые, высокий приоритет, на согласовании), «тёплые» и давно не
+    # тронутые тикеты (сек), и бюджет плановых проверок — запросов к GLPI в минуту
+    TICKET_CADENCE_HOT = int(os.getenv("GLPI_TICKET_CADENCE_HOT", "60"))
+    TICKET_CADENCE_WARM = int(os.getenv("GLPI_TICKET_CADENCE_WARM", "600"))
+    TICKET_CADENCE_COLD = int(os.getenv("GLPI_TICKET_CADENCE_COLD", "3600"))
+    SCHEDULER_BUDGET = int(os.getenv("GLPI_SCHEDULER_BUDGET", "30"))
+    # Приём вебхуков GLPI 10.x вместо частого опроса: порт (0 — выключено),
+    # адрес и путь, общий секрет подписи, допустимое расхождение часов (сек)
+    # и интервал страховочной сверки опросом, пока вебхуки включены (сек)
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "0"))
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/glpi/webhook").rstrip('/')
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_MAX_SKEW = int(os.getenv("WEBHOOK_MAX_SKEW", "300"))
+    WEBHOOK_RECONCILE_INTERVAL = int(os.getenv("WEBHOOK_RECONCILE_INTERVAL", "1800"))
+    # Очередь уведомлений (outbox): сообщений в Telegram в секунду и всплеск,
+    # попыток при временных ошибках, сколько ждать досылки при остановке (сек)
+    TG_SEND_RATE = float(os.getenv("TG_SEND_RATE", "1"))
+    TG_SEND_BURST = int(os.getenv("TG_SEND_BURST", "3"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "20"))
+    OUTBOX_FLUSH_TIMEOUT = float(os.getenv("OUTBOX_FLUSH_TIMEOUT", "10"))
+    # Больше стольких уведомлений о тикетах за цикл — сводка вместо отдельных
+    # сообщений (0 — всегда отдельные); сколько дней хранить сводки для «Подробно»
+    DIGEST_THRESHOLD = int(os.getenv("DIGEST_THRESHOLD", "10"))
+    DIGEST_TTL_DAYS = int(os.getenv("DIGEST_TTL_DAYS", "7"))
 
 # === ЛОГИРОВАНИЕ ===
 if not os.path.exists(LOG_FILE.parent):
@@ -54,65 +120,779 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# === STORAGE ===
+class Storage:
+    """Асинхронный доступ к SQLite: одно долгоживущее соединение в отдельном потоке.
+
+    Раньше каждый запрос открывал sqlite3.connect() прямо в event loop — каждый
+    execute/commit (с fsync) останавливал polling aiogram и обработчики кнопок.
+    Теперь все операции выполняются по очереди в единственном потоке-воркере
+    (порядок записей сохраняется), event loop только ждёт результат. WAL +
+    synchronous=NORMAL: чтения не блокируются записью, fsync — только на
+    checkpoint. Скомпилированные запросы переиспользуются (cached_statements).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn = None
+
+    def _connection(self):
+        # Вызывается только из потока-воркера
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
+
+    def _call(self, func, args):
+        conn = self._connection()
+        with conn:  # одна транзакция на вызов: commit или rollback
+            return func(conn, *args)
+
+    async def run(self, func, *args):
+        """Выполнить func(conn, *args) в потоке БД одной транзакцией"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, func, args)
+
+    def submit(self, func, *args):
+        """Запись «в фоне» без ожидания (для write-behind кэша имён); ошибки — в лог"""
+        future = self._executor.submit(self._call, func, args)
+        future.add_done_callback(self._log_error)
+
+    @staticmethod
+    def _log_error(future):
+        if not future.cancelled() and future.exception():
+            logger.warning(f"SQLite background write failed: {future.exception()}")
+
+    async def execute(self, sql, params=()):
+        await self.run(lambda conn: conn.execute(sql, params))
+
+    async def executemany(self, sql, seq):
+        await self.run(lambda conn: conn.executemany(sql, seq))
+
+    async def fetchone(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def close(self):
+        """Дождаться всех записей и закрыть соединение (graceful shutdown)"""
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, _close)
+
+storage = Storage(DATABASE_PATH)
+
+# === NAME CACHE ===
+class NameCache:
+    """LRU-кэш имён (User/Location/Entity) с TTL по типу и копией в SQLite.
+
+    За один цикл монитора одни и те же техники/заявители запрашиваются десятки раз
+    (extra fields, followups, solutions, задачи, согласования). Кэш живёт в памяти
+    (ограничен maxsize, вытеснение LRU) и дублируется в таблицу name_cache, чтобы
+    после рестарта не прогревать его заново. 404 кэшируется коротко (negative cache),
+    прочие ошибки не кэшируются вовсе.
+    """
+    TTL = {"user": 24 * 3600, "location": 7 * 24 * 3600, "entity": 7 * 24 * 3600}
+    NEGATIVE_TTL = 3600
+
+    def __init__(self, storage, maxsize, stats):
+        self.storage = storage
+        self.maxsize = maxsize
+        self.stats = stats
+        self._items = OrderedDict()  # (kind, id) -> (name, expires_at)
+
+    async def load(self):
+        """Прогрев из SQLite одним запросом (просроченные записи удаляются)"""
+        def _load(conn, now, limit):
+            conn.execute("DELETE FROM name_cache WHERE expires_at <= ?", (now,))
+            return conn.execute(
+                "SELECT kind, item_id, name, expires_at FROM name_cache ORDER BY expires_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+        rows = await self.storage.run(_load, time.time(), self.maxsize)
+        for kind, item_id, name, expires_at in reversed(rows):
+            self._items[(kind, item_id)] = (name, expires_at)
+        logger.info(f"Name cache warmed: {len(self._items)} entries")
+
+    def get(self, kind, item_id):
+        key = (kind, int(item_id))
+        entry = self._items.get(key)
+        if entry is None or entry[1] <= time.time():
+            self._items.pop(key, None)
+            self.stats["names_miss"] += 1
+            return None
+        self._items.move_to_end(key)
+        self.stats["names_hit"] += 1
+        return entry[0]
+
+    def put(self, kind, item_id, name, negative=False):
+        key = (kind, int(item_id))
+        expires_at = time.time() + (self.NEGATIVE_TTL if negative else self.TTL[kind])
+        self._items[key] = (name, expires_at)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        # Копия в SQLite — в фоне, вызывающий не ждёт диск
+        self.storage.submit(
+            lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO name_cache (kind, item_id, name, expires_at) VALUES (?, ?, ?, ?)",
+                (kind, key[1], name, expires_at)
+            )
+        )
+
+# === DEDUP STORE ===
+class DedupStore:
+    """Отметки «уже уведомляли»: согласования ("validation") и тикеты ("ticket"),
+    о которых директор узнал из «ТРЕБУЕТСЯ СОГЛАСОВАНИЕ».
+
+    Раньше — два set'а в GLPIClient, растущие всё время жизни процесса, причём
+    тикеты не сохранялись: после рестарта тикет, уже пришедший через
+    согласование, приходил ещё раз как «НОВАЯ ЗАЯВКА». Источник истины —
+    таблица notified (kind, item_id, ticket_id, created_at); в памяти — LRU не
+    больше maxsize записей, прогреваемый одним запросом. Промахи проверяются по
+    БД пакетом. Отметки тикетов удаляются при закрытии (expire_tickets), отметки
+    согласований — когда согласование уходит из pending_validations
+    (expire_validations): пока оно ждёт ответа, отметка должна жить, даже если
+    тикет уже закрыт, иначе «ТРЕБУЕТСЯ СОГЛАСОВАНИЕ» пришло бы повторно. Так ни
+    память, ни таблица не растут месяцами.
+    """
+
+    def __init__(self, storage, maxsize):
+        self.storage = storage
+        self.maxsize = maxsize
+        self._items = OrderedDict()  # (kind, item_id) -> ticket_id
+
+    def _remember(self, kind, item_id, ticket_id):
+        key = (kind, item_id)
+        self._items[key] = ticket_id
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    async def load(self):
+        """Прогрев одним запросом; заодно — удалить отметки уже закрытых тикетов"""
+        def _load(conn, limit):
+            conn.execute(
+                "DELETE FROM notified WHERE kind = 'ticket' "
+                "AND ticket_id IN (SELECT glpi_id FROM tickets WHERE status = 6)"
+            )
+            return conn.execute(
+                "SELECT kind, item_id, ticket_id FROM notified ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+        rows = await self.storage.run(_load, self.maxsize)
+        for kind, item_id, ticket_id in reversed(rows):
+            self._remember(kind, item_id, ticket_id)
+        logger.info(f"Dedup store warmed: {len(self._items)} entries")
+
+    async def filter_new(self, kind, item_ids):
+        """ID из item_ids, о которых ещё не уведомляли (память, затем один запрос к БД)"""
+        misses = [i for i in dict.fromkeys(item_ids) if (kind, i) not in self._items]
+        if not misses:
+            return set()
+
+        def _lookup(conn):
+            found = []
+            for start in range(0, len(misses), 500):
+                chunk = misses[start:start + 500]
+                found += conn.execute(
+                    f"SELECT item_id, ticket_id FROM notified WHERE kind = ? AND item_id IN ({','.join('?' * len(chunk))})",
+                    (kind, *chunk)
+                ).fetchall()
+            return found
+
+        found = await self.storage.run(_lookup)
+        for item_id, ticket_id in found:
+            self._remember(kind, item_id, ticket_id)
+        return set(misses) - {item_id for item_id, _ in found}
+
+    def mark(self, kind, item_id, ticket_id):
+        """Отметить в памяти → строка для save_notified() (пишется вместе с уведомлением)"""
+        self._remember(kind, item_id, ticket_id)
+        return (kind, item_id, ticket_id, time.time())
+
+    async def expire_tickets(self, ticket_ids):
+        """Забыть отметки закрытых тикетов (согласования — только через expire_validations)"""
+        ticket_ids = set(ticket_ids)
+        if not ticket_ids:
+            return
+        for key in [k for k, tid in self._items.items() if k[0] == "ticket" and tid in ticket_ids]:
+            del self._items[key]
+        await self.storage.executemany(
+            "DELETE FROM notified WHERE kind = 'ticket' AND ticket_id = ?", [(t,) for t in ticket_ids]
+        )
+
+    async def expire_validations(self, validation_ids):
+        """Забыть отметки согласований, которые больше не ждут ответа"""
+        validation_ids = set(validation_ids)
+        if not validation_ids:
+            return
+        for val_id in validation_ids:
+            self._items.pop(("validation", val_id), None)
+        await self.storage.executemany(
+            "DELETE FROM notified WHERE kind = 'validation' AND item_id = ?", [(v,) for v in validation_ids]
+        )
+
+# === RATE LIMITING ===
+# Кто делает запрос к GLPI: "interactive" (обработчики кнопок/команд) или
+# "background" (monitor_loop выставляет в своей задаче; наследуют дочерние задачи)
+GLPI_PRIORITY = contextvars.ContextVar("glpi_priority", default="interactive")
+# Журнал реально отправленных запросов (method, endpoint, range) → счётчик; задаётся
+# на время участка кода (enrich_status_changes), в остальное время None
+GLPI_REQUEST_LOG = contextvars.ContextVar("glpi_request_log", default=None)
+
+class TokenBucket:
+    """Token bucket: rate токенов/сек, запас не больше capacity (rate <= 0 — без лимита)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, n=1):
+        """Сколько секунд ждать, пока наберётся n токенов (0 — уже есть)"""
+        if self.rate <= 0:
+            return 0
+        self._refill()
+        return 0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    def take(self, n=1):
+        """Взять n токенов, если они есть → 0; иначе ничего не брать и вернуть delay()"""
+        wait = self.delay(n)
+        if wait == 0 and self.rate > 0:
+            self.tokens -= n
+        return wait
+
+class RequestGovernor:
+    """Token bucket + лимит одновременных запросов к GLPI.
+
+    Общий бюджет: GLPI_RATE_LIMIT запросов/сек (всплеск до GLPI_RATE_BURST) и не
+    более GLPI_MAX_IN_FLIGHT запросов одновременно. Фоновый мониторинг занимает
+    не больше GLPI_BACKGROUND_IN_FLIGHT слотов и пропускает вперёд любого
+    ожидающего интерактивного — клики не стоят в очереди за check_tickets().
+    Внутри каждого класса очередь FIFO.
+    """
+
+    def __init__(self, rate, burst, max_in_flight, background_in_flight, stats):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max(max_in_flight, 1)
+        self.background_in_flight = max(min(background_in_flight, self.max_in_flight), 1)
+        self.in_flight = Counter()
+        self.queues = {"interactive": deque(), "background": deque()}
+        self.stats = stats
+        self._cond = None
+
+    def _try_take(self, priority, ticket):
+        """(True, None) — слот получен; (False, delay) — ждать до delay сек (None — до release)"""
+        if self.queues[priority][0] is not ticket:
+            return False, None
+        if priority == "background" and self.queues["interactive"]:
+            return False, None
+        if sum(self.in_flight.values()) >= self.max_in_flight:
+            return False, None
+        if priority == "background" and self.in_flight["background"] >= self.background_in_flight:
+            return False, None
+        wait = self.bucket.delay()
+        if wait:
+            return False, wait
+        self.bucket.take()
+        self.queues[priority].popleft()
+        self.in_flight[priority] += 1
+        return True, None
+
+    async def acquire(self, priority):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        ticket = object()
+        queue = self.queues[priority]
+        queue.append(ticket)
+        waited = False
+        try:
+            async with self._cond:
+                while True:
+                    ok, delay = self._try_take(priority, ticket)
+                    if ok:
+                        # Следующий в очереди мог стать первым — пусть перепроверит
+                        self._cond.notify_all()
+                        break
+                    waited = True
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+        except BaseException:
+            if ticket in queue:
+                queue.remove(ticket)
+                async with self._cond:
+                    self._cond.notify_all()
+            raise
+        if waited:
+            self.stats[f"throttled_{priority}"] += 1
+
+    async def release(self, priority):
+        self.in_flight[priority] -= 1
+        async with self._cond:
+            self._cond.notify_all()
+
 # === GLPI API CLIENT ===
+class GLPIAPIError(Exception):
+    """Неожиданный HTTP-статус от GLPI API"""
+
+class GLPIUnavailable(GLPIAPIError):
+    """GLPI признан недоступным (circuit breaker разомкнут) — запрос не отправлялся"""
+
+class CircuitBreaker:
+    """Circuit breaker для запросов к GLPI.
+
+    closed    — запросы идут как обычно; после GLPI_BREAKER_THRESHOLD отказов
+                подряд (сетевая ошибка, таймаут, HTTP 5xx) — open.
+    open      — запросы сразу падают с GLPIUnavailable, не занимая соединений.
+    half_open — по истечении паузы пропускается ровно один пробный запрос:
+                успех замыкает цепь, отказ снова размыкает её с удвоенной паузой
+                (до GLPI_BREAKER_MAX_COOLDOWN).
+    """
+
+    def __init__(self, threshold, cooldown, max_cooldown):
+        self.threshold = max(threshold, 1)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(max_cooldown, cooldown)
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def retry_in(self):
+        """Сколько секунд до следующего пробного запроса (0 — можно сейчас)"""
+        if self.state == "closed":
+            return 0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def before_request(self):
+        """Проверить, можно ли отправлять запрос; иначе GLPIUnavailable.
+
+        Возвращает True, если этот запрос — пробный (half-open).
+        """
+        if self.state == "closed":
+            return False
+        if self.state == "open" and self.retry_in() == 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        raise GLPIUnavailable(f"GLPI unavailable, retry in {self.retry_in():.0f}s")
+
+    def record_success(self, probe):
+        if probe:
+            self.probe_in_flight = False
+        if self.state != "closed":
+            logger.info("✅ GLPI is back, circuit closed")
+        self.state = "closed"
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self, probe):
+        if probe:
+            self.probe_in_flight = False
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open()
+            return
+        self.failures += 1
+        if self.state == "closed" and self.failures >= self.threshold:
+            self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        logger.warning(f"⛔ GLPI unavailable ({self.failures} failures), circuit open for {self.cooldown:.0f}s")
+
 class GLPIClient:
+    # Членство в группах меняется редко — не перезапрашиваем на каждое "Мои заявки"
+    GROUPS_TTL = 3600
+    # Вид записи в NameCache -> itemtype GLPI
+    NAME_ITEMTYPES = {"user": "User", "location": "Location", "entity": "Entity"}
+
     def __init__(self):
         self.session_token = None
         self.headers = {
             "Content-Type": "application/json",
             "App-Token": Config.GLPI_APP_TOKEN
         }
-        # Память для отправленных уведомлений о валидациях
-        self.notified_validations = set()
-        # Ticket IDs, уведомлённые через согласования (для дедупликации)
-        self.notified_ticket_ids = set()
+        # Уже уведомлённые согласования и тикеты, пришедшие через согласование
+        self.dedup = DedupStore(storage, Config.DEDUP_CACHE_SIZE)
+        # Общая HTTP-сессия с пулом keep-alive соединений (создаётся в init_session)
+        self._http = None
+        # Счётчики HTTP-слоя: запросы, новые/переиспользованные соединения
+        self.stats = Counter()
+        # Кэш имён пользователей/локаций/филиалов
+        self.names = NameCache(storage, Config.NAME_CACHE_SIZE, self.stats)
+        # (group_ids, expires_at) для get_user_groups()
+        self._groups_cache = None
+        # Rate limit / max in-flight с приоритетом интерактивных запросов
+        self.governor = RequestGovernor(
+            Config.GLPI_RATE_LIMIT, Config.GLPI_RATE_BURST,
+            Config.GLPI_MAX_IN_FLIGHT, Config.GLPI_BACKGROUND_IN_FLIGHT, self.stats,
+        )
+        # Circuit breaker: при недоступном GLPI запросы не отправляются
+        self.breaker = CircuitBreaker(
+            Config.GLPI_BREAKER_THRESHOLD, Config.GLPI_BREAKER_COOLDOWN, Config.GLPI_BREAKER_MAX_COOLDOWN,
+        )
+        self._timeout = aiohttp.ClientTimeout(total=Config.GLPI_TIMEOUT)
+        # Повторный вход в GLPI — строго по одному (см. reauthenticate)
+        self._auth_lock = asyncio.Lock()
+        # Летящие GET-запросы: ключ -> {"task", "waiters"} (single-flight в _request)
+        self._inflight = {}
+
+    def _get_http(self):
+        """Общая aiohttp-сессия: один пул соединений на весь процесс.
+
+        Раньше каждый метод открывал свой ClientSession — каждый запрос платил
+        за DNS + TCP (+TLS) handshake. Теперь соединения к GLPI переиспользуются.
+        """
+        if self._http is None or self._http.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=Config.GLPI_POOL_SIZE,
+                keepalive_timeout=Config.GLPI_KEEPALIVE,
+                ttl_dns_cache=Config.GLPI_DNS_TTL,
+            )
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_created)
+            trace.on_connection_reuseconn.append(self._on_connection_reused)
+            self._http = aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+        return self._http
+
+    async def _on_connection_created(self, session, ctx, params):
+        self.stats["conn_created"] += 1
+
+    async def _on_connection_reused(self, session, ctx, params):
+        self.stats["conn_reused"] += 1
+
+    def format_stats(self):
+        """Краткая сводка счётчиков клиента для лога"""
+        return ", ".join(f"{k}={v}" for k, v in sorted(self.stats.items())) or "no requests"
+
+    async def close(self):
+        """Закрыть общую HTTP-сессию (graceful shutdown)"""
+        for entry in list(self._inflight.values()):
+            entry["task"].cancel()
+        self._inflight.clear()
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+
+    async def _request(self, method, endpoint, params=None, json=None, headers=None):
+        """Единая точка HTTP-вызовов GLPI через общую сессию.
+
+        Возвращает (status, data, resp_headers): data — распарсенный JSON, либо
+        текст ответа, если тело не JSON. Сетевые исключения пробрасываются —
+        их обрабатывают вызывающие методы, как и раньше.
+
+        Single-flight: одинаковые GET (endpoint, params, заголовки сессии), уже
+        летящие к GLPI, не дублируются — монитор и обработчики кнопок ждут один
+        общий ответ. Если ответ достался нескольким вызывающим, каждый получает
+        свою копию data (вызывающие методы дописывают поля в ответ).
+
+        Запрос с заголовками текущей сессии, получивший отказ по сессии (401),
+        один раз повторяется после reauthenticate() — с новым токеном.
+        """
+        if headers is not None:
+            return await self._request_once(method, endpoint, params, json, headers)
+
+        token = self.session_token
+        result = await self._request_once(method, endpoint, params, json, self.get_headers())
+        if self._is_session_error(result[0], result[1]):
+            logger.warning(f"GLPI session rejected ({result[0]}) on {endpoint}, re-authenticating...")
+            # 401 — GLPI сессию уже забыл, killSession для неё бесполезен
+            if await self.reauthenticate(token, kill_stale=result[0] != 401):
+                result = await self._request_once(method, endpoint, params, json, self.get_headers())
+        return result
+
+    @staticmethod
+    def _is_session_error(status, data):
+        """Отказ из-за сессии: 401 или ERROR_SESSION_* (400 — токен не передан, 403)"""
+        if status == 401:
+            return True
+        return status in (400, 403) and isinstance(data, list) and bool(data) and str(data[0]).startswith("ERROR_SESSION")
+
+    async def reauthenticate(self, stale_token, kill_stale=True):
+        """Перелогиниться вместо stale_token — один initSession на всех.
+
+        Под _auth_lock: если, пока мы ждали блокировку, другой запрос уже получил
+        новый токен, просто используем его. Иначе initSession, а старая сессия
+        закрывается через killSession, чтобы не копить их на стороне GLPI.
+        """
+        async with self._auth_lock:
+            if self.session_token and self.session_token != stale_token:
+                return True
+            self.stats["reauth"] += 1
+            ok = await self.init_session()
+        if ok and stale_token and kill_stale and stale_token != self.session_token:
+            await self._kill_session(stale_token)
+        return ok
+
+    async def _kill_session(self, token):
+        """Закрыть сессию GLPI (best effort)"""
+        headers = self.headers.copy()
+        headers["Session-Token"] = token
+        try:
+            await self._request("GET", "/killSession", headers=headers)
+        except Exception as e:
+            logger.debug(f"killSession failed: {e}")
+
+    async def _request_once(self, method, endpoint, params, json, headers):
+        if method != "GET":
+            return await self._send(method, endpoint, params, json, headers)
+
+        # Приоритет — часть ключа: интерактивный запрос не должен ждать в фоновой
+        # очереди governor'а, присоединившись к запросу, начатому монитором
+        key = (
+            GLPI_PRIORITY.get(),
+            endpoint,
+            tuple(sorted((k, str(v)) for k, v in (params or {}).items())),
+            tuple(sorted((headers or {}).items())),
+        )
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(self._send(method, endpoint, params, None, headers))
+            entry = {"task": task, "waiters": 0}
+            self._inflight[key] = entry
+
+            def _forget(_task, key=key, entry=entry):
+                # Ответ не кэшируется: следующий такой же GET уйдёт в GLPI заново
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+
+            task.add_done_callback(_forget)
+        else:
+            self.stats["coalesced"] += 1
+        entry["waiters"] += 1
+
+        # shield: отмена одного вызывающего не должна обрывать запрос для остальных
+        status, data, resp_headers = await asyncio.shield(entry["task"])
+        if entry["waiters"] > 1:
+            data = copy.deepcopy(data)
+        return status, data, resp_headers
+
+    async def _send(self, method, endpoint, params, json, headers):
+        """Собственно HTTP-запрос к GLPI (без single-flight), через RequestGovernor.
+
+        Каждый запрос ограничен GLPI_TIMEOUT и проходит через circuit breaker:
+        сетевые ошибки, таймауты и 5xx считаются отказами, любой другой ответ
+        (в т.ч. 4xx) — признаком, что GLPI жив. При разомкнутой цепи сразу
+        поднимается GLPIUnavailable.
+        """
+        url = f"{Config.GLPI_URL}/apirest.php{endpoint}"
+        probe = self.breaker.before_request()
+        priority = GLPI_PRIORITY.get()
+        try:
+            await self.governor.acquire(priority)
+        except BaseException:
+            if probe:
+                self.breaker.probe_in_flight = False
+            raise
+        try:
+            self.stats["requests"] += 1
+            request_log = GLPI_REQUEST_LOG.get()
+            if request_log is not None:
+                request_log[(method, endpoint, (params or {}).get("range"))] += 1
+            session = self._get_http()
+            async with session.request(method, url, headers=headers, params=params, json=json, timeout=self._timeout) as resp:
+                try:
+                    data = await resp.json(content_type=None)
+                except ValueError:
+                    data = await resp.text()
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats["failures"] += 1
+            self.breaker.record_failure(probe)
+            raise GLPIUnavailable(f"{method} {endpoint}: {type(e).__name__}: {e}") from e
+        except BaseException:
+            if probe:
+                self.breaker.probe_in_flight = False
+            raise
+        finally:
+            await self.governor.release(priority)
+
+        if status >= 500:
+            self.stats["failures"] += 1
+            self.breaker.record_failure(probe)
+        else:
+            self.breaker.record_success(probe)
+        return status, data, resp.headers
+
+    async def probe(self):
+        """Пробный запрос к GLPI (самый дешёвый) — для monitor_loop при разомкнутой цепи"""
+        try:
+            status, _, _ = await self._request("GET", "/getActiveEntities")
+            return status < 500
+        except GLPIUnavailable:
+            return False
+
+    async def _paginate(self, endpoint, params=None, page_size=None, prefetch=None):
+        """Постраничный обход list/search endpoint'ов GLPI (async generator страниц).
+
+        Вместо жёстких окон range=0-N (всё, что дальше, молча терялось) читает total из
+        Content-Range (list endpoints) или totalcount (search) и отдаёт страницы по
+        page_size строк. Пока вызывающий обрабатывает страницу, ещё до `prefetch` следующих
+        уже запрошены (prefetch=0 — строго последовательно). Вызывающий может выйти из цикла в любой момент — незавершённые
+        запросы отменяются. В памяти одновременно не больше prefetch + 1 страниц.
+        """
+        page_size = page_size or Config.GLPI_PAGE_SIZE
+        depth = Config.GLPI_PREFETCH if prefetch is None else prefetch
+        base_params = dict(params or {})
+
+        async def _fetch(start):
+            page_params = dict(base_params, range=f"{start}-{start + page_size - 1}")
+            status, data, headers = await self._request("GET", endpoint, params=page_params)
+            if status == 400 and "ERROR_RANGE_EXCEED_TOTAL" in str(data):
+                return [], 0
+            if status not in [200, 206]:
+                # Не обрываем обход молча: вызывающий должен отличать ошибку от конца данных
+                raise GLPIAPIError(f"{endpoint} [{page_params['range']}]: HTTP {status}")
+            items = data.get("data", []) if isinstance(data, dict) else (data or [])
+            total = None
+            content_range = headers.get("Content-Range", "")
+            if "/" in content_range:
+                try:
+                    total = int(content_range.rsplit("/", 1)[1])
+                except ValueError:
+                    total = None
+            if total is None and isinstance(data, dict) and "totalcount" in data:
+                total = int(data["totalcount"])
+            return items, total
+
+        pending = deque()
+        next_start = 0
+
+        def _schedule():
+            nonlocal next_start
+            pending.append(asyncio.ensure_future(_fetch(next_start)))
+            next_start += page_size
+
+        def _has_more(items, total):
+            if total is not None:
+                return next_start < total
+            # total неизвестен — не больше одной страницы вперёд
+            return len(items) >= page_size and not pending
+
+        _schedule()
+        try:
+            while pending:
+                items, total = await pending.popleft()
+                if not items:
+                    return
+                # Заказываем следующие страницы до того, как отдать текущую
+                while len(pending) < depth and _has_more(items, total):
+                    _schedule()
+                yield items
+                # prefetch=0: следующая страница — только когда её реально попросили
+                if not pending and _has_more(items, total):
+                    _schedule()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
     async def init_session(self):
         """Авторизация и переключение в режим Global View"""
         try:
-            url = f"{Config.GLPI_URL}/apirest.php/initSession"
             headers = self.headers.copy()
             headers["Authorization"] = f"user_token {Config.GLPI_USER_TOKEN}"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        self.session_token = data.get("session_token")
-                        
-                        # Логируем текущую сущность
-                        current_entity = data.get("session", {}).get("glpiactive_entity", "Unknown")
-                        logger.info(f"✅ GLPI Session initialized. Current Entity ID: {current_entity}")
-                        
-                        # Переключаемся в режим Global View (Root entity с рекурсией)
-                        if await self._enable_global_view():
-                            logger.info("✅ Global View enabled: entities_id=0, recursive=true")
-                        else:
-                            logger.warning("⚠️ Failed to enable Global View, using current entity")
-                        
-                        return True
-                    logger.error(f"GLPI Auth failed: {resp.status}")
-                    return False
+
+            status, data, _ = await self._request("GET", "/initSession", headers=headers)
+            if status == 200:
+                self.session_token = data.get("session_token")
+
+                # Логируем текущую сущность
+                current_entity = data.get("session", {}).get("glpiactive_entity", "Unknown")
+                logger.info(f"✅ GLPI Session initialized. Current Entity ID: {current_entity}")
+
+                # Переключаемся в режим Global View (Root entity с рекурсией)
+                if await self._enable_global_view():
+                    logger.info("✅ Global View enabled: entities_id=0, recursive=true")
+                else:
+                    logger.warning("⚠️ Failed to enable Global View, using current entity")
+
+                # Сохраняем токен для следующего запуска (см. restore_session)
+                await set_state("glpi_session_token", self.session_token)
+                await set_state("glpi_session_owner", self._session_owner())
+                return True
+            logger.error(f"GLPI Auth failed: {status}")
+            return False
         except Exception as e:
             logger.error(f"Connection error: {e}")
             return False
-    
+
+    @staticmethod
+    def _session_owner():
+        """Отпечаток GLPI_URL + user token: сохранённая сессия годится только для них"""
+        raw = f"{Config.GLPI_URL}|{Config.GLPI_USER_TOKEN}".encode()
+        return hashlib.sha256(raw).hexdigest()[:16]
+
+    async def restore_session(self):
+        """Быстрый старт: переиспользовать сессию GLPI, сохранённую прошлым запуском.
+
+        Токен проверяется одним лёгким запросом (getActiveEntities), который
+        заодно показывает, включён ли ещё Global View. Полный вход
+        (initSession + changeActiveEntities) — только если токена нет, он
+        выдан для другого GLPI/пользователя или GLPI его отверг.
+        """
+        token = await get_state("glpi_session_token")
+        if not token or await get_state("glpi_session_owner") != self._session_owner():
+            return await self.reauthenticate(None)
+
+        self.session_token = token
+        try:
+            status, data, _ = await self._request("GET", "/getActiveEntities")
+        except Exception as e:
+            # GLPI не отвечает — initSession сейчас тоже не пройдёт; токен оставляем,
+            # при 401 его заменит _request (reauthenticate)
+            logger.warning(f"⚠️ Could not verify saved GLPI session: {e}")
+            return False
+
+        # Отвергнутый токен _request уже заменил новым (reauthenticate)
+        if status != 200:
+            logger.warning(f"⚠️ getActiveEntities returned: {status}")
+            return False
+
+        active = data.get("active_entity", {}) if isinstance(data, dict) else {}
+        if str(active.get("id")) != "0" or not int(active.get("active_entity_recursive") or 0):
+            logger.info("♻️ Saved GLPI session is not in Global View, switching")
+            if not await self._enable_global_view():
+                logger.warning("⚠️ Failed to enable Global View, using current entity")
+        logger.info("✅ GLPI session restored")
+        return True
+
     async def _enable_global_view(self):
         """Переключение в режим просмотра всех сущностей (Root + recursive)"""
         try:
-            url = f"{Config.GLPI_URL}/apirest.php/changeActiveEntities"
             payload = {
                 "entities_id": 0,  # Root entity
                 "is_recursive": True  # Включить рекурсивный просмотр
             }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=self.get_headers(), json=payload) as resp:
-                    if resp.status in [200, 201]:
-                        logger.info("🔍 Recursive search enabled for all entities")
-                        return True
-                    logger.warning(f"changeActiveEntities returned: {resp.status}")
-                    return False
+
+            # Явные заголовки — без повтора через reauthenticate(): init_session
+            # вызывается под _auth_lock, и повторный вход в него завис бы навсегда
+            status, _, _ = await self._request("POST", "/changeActiveEntities", json=payload,
+                                               headers=self.get_headers())
+            if status in [200, 201]:
+                logger.info("🔍 Recursive search enabled for all entities")
+                return True
+            logger.warning(f"changeActiveEntities returned: {status}")
+            return False
         except Exception as e:
             logger.error(f"Error enabling global view: {e}")
             return False
@@ -132,145 +912,162 @@ class GLPIClient:
         return "\n".join([line.strip() for line in text.splitlines() if line.strip()])
 
     async def get_pending_validations(self):
-        """Поиск заявок на согласование для директора (DIRECT OBJECT RETRIEVAL)"""
-        if not self.session_token:
-            await self.init_session()
-        
+        """Поиск заявок на согласование для директора (DIRECT OBJECT RETRIEVAL)
+
+        Инкрементальный скан вместо "последних 100 записей":
+        1. /TicketValidation читается от новых к старым только до сохранённого
+           watermark (validation_max_id) — обычно это одна короткая страница.
+        2. Ранее найденные ожидающие согласования (таблица pending_validations)
+           перепроверяются точечно: решённые/удалённые выпадают из набора.
+        Первый запуск (watermark нет) — полный обход таблицы постранично.
+        """
+        await self._ensure_session()
+
         # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ v2.3:
         # Отказываемся от ненадежного Search API (проблемы с Field ID mapping)
         # Используем прямое получение объектов /TicketValidation
         # Это дает нам чистый JSON с именованными ключами: id, tickets_id, users_id_validate, status
-        
-        validations = []
-        
+
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/TicketValidation"
-                params = {
-                    "range": "0-100",      # Лимит на 100 записей
-                    "order": "DESC",       # Сортировка по убыванию
-                    "sort": "id",          # Сортировать по ID
-                    "is_deleted": 0        # Только активные (не в корзине)
-                }
-                
-                logger.info(f"🚀 Fetching validations from: {url}")
-                
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status != 200:
-                        logger.error(f"❌ API Error: HTTP {resp.status}")
-                        return []
-                    
-                    raw_data = await resp.json()
-                    
-                    # Логируем первый элемент для диагностики структуры
-                    if raw_data and isinstance(raw_data, list) and len(raw_data) > 0:
-                        logger.info(f"📦 First item sample: {raw_data[0]}")
-                    
-                    my_id = Config.GLPI_MY_ID
-                    
-                    # Фильтруем в Python (надежнее, чем полагаться на GLPI Search API)
-                    for item in raw_data:
-                        try:
-                            # Извлекаем ключевые поля
-                            status = int(item.get('status', 0))
-                            validator_id = int(item.get('users_id_validate', 0))
-                            
-                            # Фильтр: Status = 2 (Waiting) И Validator = Я
-                            if status == 2 and validator_id == my_id:
-                                validations.append({
-                                    'id': item['id'],
-                                    'ticket_id': item['tickets_id'],
-                                    'comment_submission': item.get('comment_submission', '')
-                                })
-                                logger.info(f"  ✅ Validation ID: {item['id']}, Ticket ID: {item['tickets_id']}, Validator: {validator_id}")
-                        except (KeyError, ValueError, TypeError) as e:
-                            logger.warning(f"  ⚠️ Skipping malformed item: {e}")
-                            continue
-                    
-                    logger.info(f"✅ Found {len(validations)} pending validations for User {my_id}")
-                    return validations
-                    
+            params = {
+                "order": "DESC",       # Сортировка по убыванию
+                "sort": "id",          # Сортировать по ID
+                "is_deleted": 0        # Только активные (не в корзине)
+            }
+
+            my_id = Config.GLPI_MY_ID
+            max_seen = int(await get_state("validation_max_id", "0"))
+            known = await load_pending_validations()
+            new_max = max_seen
+            found = {}
+
+            logger.info(f"🚀 Scanning validations above #{max_seen} ({len(known)} known pending)")
+
+            # prefetch=0: обычно всё новое помещается в первую страницу
+            async for raw_data in self._paginate("/TicketValidation", params, prefetch=0):
+                reached_watermark = False
+
+                # Фильтруем в Python (надежнее, чем полагаться на GLPI Search API)
+                for item in raw_data:
+                    try:
+                        # Извлекаем ключевые поля
+                        val_id = int(item['id'])
+                        if val_id <= max_seen:
+                            reached_watermark = True
+                            break
+                        new_max = max(new_max, val_id)
+                        status = int(item.get('status', 0))
+                        validator_id = int(item.get('users_id_validate', 0))
+
+                        # Фильтр: Status = 2 (Waiting) И Validator = Я
+                        if status == 2 and validator_id == my_id:
+                            found[val_id] = {
+                                'id': val_id,
+                                'ticket_id': item['tickets_id'],
+                                'comment_submission': item.get('comment_submission', '')
+                            }
+                            logger.info(f"  ✅ Validation ID: {val_id}, Ticket ID: {item['tickets_id']}, Validator: {validator_id}")
+                    except (KeyError, ValueError, TypeError) as e:
+                        logger.warning(f"  ⚠️ Skipping malformed item: {e}")
+                        continue
+
+                if reached_watermark:
+                    break
+
+            # Перепроверяем ранее известные pending (их статус мог смениться)
+            recheck = {vid: val for vid, val in known.items() if vid not in found}
+            still_pending = await self._recheck_pending_validations(recheck)
+
+            current = {**still_pending, **found}
+            # Согласования закрытых тикетов директора больше не ждут
+            closed = await load_closed_ticket_ids(self._parse_id(v['ticket_id']) for v in current.values())
+            if closed:
+                current = {vid: v for vid, v in current.items() if self._parse_id(v['ticket_id']) not in closed}
+            await save_pending_validations(current.values())
+            await self.dedup.expire_validations(set(known) - set(current))
+            if new_max > max_seen:
+                await set_state("validation_max_id", new_max)
+
+            validations = sorted(current.values(), key=lambda v: v['id'], reverse=True)
+            logger.info(
+                f"✅ Found {len(validations)} pending validations for User {my_id} "
+                f"(new: {len(found)}, rechecked: {len(recheck)})"
+            )
+            return validations
+
         except Exception as e:
             logger.error(f"❌ Validation fetch error: {e}")
             return []
-    
-    async def get_all_pending_validations(self):
-        """Получить ВСЕ ожидающие согласования (режим супервизора)"""
-        if not self.session_token:
-            await self.init_session()
-        
-        validations = []
-        
+
+    async def _recheck_pending_validations(self, known):
+        """Оставить из known ({id: validation}) только те, что всё ещё ждут согласования.
+
+        Перепроверка одним пакетом (getMultipleItems). Если пакет не удался, набор
+        остаётся как есть — перепроверим в следующем цикле.
+        """
+        if not known:
+            return {}
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/TicketValidation"
-                params = {
-                    "range": "0-50",
-                    "order": "DESC",
-                    "sort": "id",
-                    "is_deleted": 0
-                }
-                
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status != 200:
-                        return []
-                    
-                    raw_data = await resp.json()
-                    
-                    for item in raw_data:
-                        try:
-                            status = int(item.get("status", 0))
-                            if status == 2:  # Waiting
-                                validator_id = int(item.get("users_id_validate", 0))
-                                validator_name = await self._get_user_name(validator_id)
-                                
-                                validations.append({
-                                    "id": item["id"],
-                                    "ticket_id": item["tickets_id"],
-                                    "validator_id": validator_id,
-                                    "validator_name": validator_name,
-                                    "is_mine": validator_id == Config.GLPI_MY_ID
-                                })
-                        except (KeyError, ValueError, TypeError):
-                            continue
-                    
-                    return validations
-                    
+            current = await self.get_multiple_items("TicketValidation", list(known))
         except Exception as e:
-            logger.error(f"Error fetching all validations: {e}")
-            return []
+            logger.warning(f"  ⚠️ Recheck of pending validations failed: {e}")
+            return dict(known)
+
+        still_pending = {}
+        for val_id, val in known.items():
+            item = current.get(val_id)
+            try:
+                if item and int(item.get('status', 0)) == 2 and int(item.get('users_id_validate', 0)) == Config.GLPI_MY_ID:
+                    still_pending[val_id] = val
+            except (ValueError, TypeError):
+                continue
+        return still_pending
+
+    async def iter_all_pending_validations(self, page_size=None):
+        """Все ожидающие согласования (режим супервизора) — поток страниц, новые первыми.
+
+        Async generator: страницы /TicketValidation читаются по мере потребления,
+        так что вызывающий, набравший нужное число карточек, может остановиться.
+        Имена согласующих на странице разрешаются одним пакетом.
+
+        Ожидающие отбирает сам GLPI (searchText[status]=2 — LIKE, но статусы
+        согласования однозначные: 1..4), иначе при меньше чем 10 ожидающих каждый
+        /approvals листал бы всю историю TicketValidation. Проверка статуса на
+        клиенте остаётся как страховка.
+        """
+        await self._ensure_session()
+
+        params = {
+            "order": "DESC",
+            "sort": "id",
+            "is_deleted": 0,
+            "searchText[status]": 2,
+        }
 
-    async def get_ticket_details(self, ticket_id):
-        """Получить детали тикета по ID с информацией о заявителе"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # 1. Получаем основные данные тикета
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}"
-                params = {"expand_dropdowns": "true"}
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status != 200:
-                        return None
-                    ticket = await resp.json()
-                
-                # 2. Получаем связанных пользователей через Ticket_User
-                users_url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/Ticket_User"
-                async with session.get(users_url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        ticket_users = await resp.json()
-                        # Ищем заявителя (type=1)
-                        for tu in ticket_users:
-                            if tu.get('type') == 1:  # Requester
-                                user_id = tu.get('users_id')
-                                if user_id:
-                                    # Получаем имя пользователя
-                                    user_name = await self._get_user_name(user_id)
-                                    ticket['_users_id_requester'] = user_name
-                                break
-                
-                return ticket
+            async for raw_data in self._paginate("/TicketValidation", params, page_size=page_size):
+                page = []
+                for item in raw_data:
+                    try:
+                        status = int(item.get("status", 0))
+                        if status == 2:  # Waiting
+                            page.append({
+                                "id": item["id"],
+                                "ticket_id": item["tickets_id"],
+                                "validator_id": int(item.get("users_id_validate", 0)),
+                            })
+                    except (KeyError, ValueError, TypeError):
+                        continue
+                if not page:
+                    continue
+
+                names = await self._get_names("user", [v["validator_id"] for v in page if v["validator_id"]])
+                for val in page:
+                    val["validator_name"] = names.get(val["validator_id"], "Неизвестно")
+                    val["is_mine"] = val["validator_id"] == Config.GLPI_MY_ID
+                yield page
         except Exception as e:
-            logger.error(f"Error in get_ticket_details: {e}")
-            return None
+            logger.error(f"Error fetching all validations: {e}")
 
     async def _clean_html(self, html_content):
         """Очистка HTML с использованием BeautifulSoup или regex"""
@@ -322,10 +1119,82 @@ class GLPIClient:
         # Шаг 5: Экранируем для безопасной вставки в Telegram HTML
         return html.escape(text)
 
-    async def get_active_tickets(self):
-        """Получить активные тикеты где пользователь — Requester, Assignee или Observer."""
-        if not self.session_token:
-            await self.init_session()
+    # Двухфазная выборка тикетов: опрос идёт по «тонкой» проекции, а тяжёлые поля
+    # (Content — полный HTML, Title, имена) дочитываются только для тех тикетов,
+    # что реально попадут в уведомление или на экран (hydrate_tickets).
+    # Field IDs: 2=ID, 12=Status, 19=Date_mod, 3=Priority, 5=Tech (ID), 52=Global validation
+    SLIM_FIELDS = [2, 12, 19, 3, 5, 52]
+    # 1=Title, 15=Date, 21=Content, 4=Requester, 5=Tech (83=Location — None, см. _resolve_ticket_extra_fields)
+    DETAIL_FIELDS = [2, 1, 15, 21, 4, 5]
+
+    @staticmethod
+    def _ticket_from_row(item):
+        """Строка Search API → dict тикета (заполняются только поля, что есть в строке)"""
+        # GLPI returns string keys: '2', '1', '12', '15', '21'
+        ticket = {"id": item.get("2")}
+        if "12" in item:
+            try:
+                ticket["status"] = int(item.get("12", 0))
+            except (ValueError, TypeError):
+                ticket["status"] = 0
+        if "19" in item:
+            ticket["date_mod"] = item.get("19") or ""
+        if "3" in item:
+            try:
+                ticket["priority"] = int(item.get("3") or 3)
+            except (ValueError, TypeError):
+                ticket["priority"] = 3
+        if "52" in item:
+            try:
+                ticket["global_validation"] = int(item.get("52"))
+            except (ValueError, TypeError):
+                ticket["global_validation"] = None
+        if "1" in item:
+            ticket["title"] = item.get("1") or "Без названия"
+        if "15" in item:
+            ticket["date"] = item.get("15") or ""
+        if "21" in item:
+            ticket["content"] = item.get("21") or ""
+        if "4" in item:
+            ticket["requester_name"] = item.get("4") or ""
+        if "5" in item:
+            ticket["technician_name"] = item.get("5") or ""
+        return ticket
+
+    async def hydrate_tickets(self, tickets):
+        """Вторая фаза: дочитать Title/Date/Content/Location/имена для «тонких» тикетов.
+
+        Один поиск по списку ID (DETAIL_FIELDS) + _resolve_ticket_extra_fields —
+        всё пакетно. Тикеты дополняются на месте; возвращается тот же список.
+        """
+        if not tickets:
+            return tickets
+        try:
+            rows = await self._search_tickets_by_ids([t.get("id") for t in tickets], self.DETAIL_FIELDS)
+        except Exception as e:
+            logger.error(f"  Ticket details search error: {e}")
+            rows = {}
+        for ticket in tickets:
+            row = rows.get(self._parse_id(ticket.get("id")))
+            details = self._ticket_from_row(row) if row else {}
+            details.pop("id", None)
+            ticket.update(details)
+            ticket.setdefault("title", "Без названия")
+            ticket.setdefault("date", "")
+            ticket.setdefault("content", "")
+            ticket.setdefault("requester_name", "")
+            ticket.setdefault("technician_name", "")
+
+        await self._resolve_ticket_extra_fields(tickets)
+        return tickets
+
+    async def get_active_tickets(self, detail_limit=None):
+        """Получить активные тикеты где пользователь — Requester, Assignee или Observer.
+
+        Поиск по ролям идёт по тонкой проекции; детали дочитываются только для
+        первых detail_limit тикетов (None — для всех), которые будут показаны.
+        """
+        await self._ensure_session()
 
         async def _fetch_by_role(field_id, role_name):
             """Запрос тикетов по роли пользователя"""
@@ -336,72 +1205,58 @@ class GLPIClient:
             return await _do_fetch(field_id, group_id, role_name)
 
         async def _do_fetch(field_id, value, role_name):
-            """Общий запрос тикетов"""
+            """Общий запрос тикетов.
+
+            Закрытые отсекает сам GLPI: роль AND (1 OR ... OR 5) — иначе пагинация
+            прошла бы всю историю заявок пользователя/группы. Статусы — явным OR по
+            equals, см. ловушку с notequals в get_all_active_tickets().
+            """
             params = {
                 "criteria[0][field]": field_id,
                 "criteria[0][searchtype]": "equals",
                 "criteria[0][value]": value,
                 "is_deleted": 0,
-                # Field IDs: 2=ID, 1=Title, 12=Status, 15=Date, 21=Content, 83=Location, 4=Requester, 5=Tech
-                "forcedisplay[0]": 2,
-                "forcedisplay[1]": 1,
-                "forcedisplay[2]": 12,
-                "forcedisplay[3]": 15,
-                "forcedisplay[4]": 21,
-                "forcedisplay[5]": 83,
-                "forcedisplay[6]": 4,
-                "forcedisplay[7]": 5,
-                "range": "0-100",
                 "sort": "2",
                 "order": "DESC",
             }
+            params["criteria[1][link]"] = "AND"
+            for i, st in enumerate([1, 2, 3, 4, 5]):
+                if i:
+                    params[f"criteria[1][criteria][{i}][link]"] = "OR"
+                params[f"criteria[1][criteria][{i}][field]"] = 12
+                params[f"criteria[1][criteria][{i}][searchtype]"] = "equals"
+                params[f"criteria[1][criteria][{i}][value]"] = st
+            for i, field in enumerate(self.SLIM_FIELDS):
+                params[f"forcedisplay[{i}]"] = field
 
             try:
-                async with aiohttp.ClientSession() as session:
-                    url = f"{Config.GLPI_URL}/apirest.php/search/Ticket"
-                    async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                        if resp.status in [200, 206]:
-                            data = await resp.json()
-                            results = []
-                            for item in data.get("data", []):
-                                # GLPI returns string keys: '2', '1', '12', '15', '21'
-                                try:
-                                    status_val = int(item.get("12", 0))
-                                except (ValueError, TypeError):
-                                    status_val = 0
-
-                                results.append({
-                                    "id": item.get("2"),
-                                    "title": item.get("1", "Без названия"),
-                                    "status": status_val,
-                                    "date": item.get("15", ""),
-                                    "content": item.get("21", ""),
-                                    "location_name": item.get("83", ""),
-                                    "requester_name": item.get("4", ""),
-                                    "technician_name": item.get("5", ""),
-                                })
-                            logger.info(f"  {role_name}: {len(results)} tickets")
-                            return results
-                        else:
-                            logger.warning(f"  {role_name}: HTTP {resp.status}")
-                            return []
+                results = []
+                async for page in self._paginate("/search/Ticket", params):
+                    results.extend(self._ticket_from_row(item) for item in page)
+                logger.info(f"  {role_name}: {len(results)} tickets")
+                return results
             except Exception as e:
                 logger.error(f"  {role_name} error: {e}")
                 return []
 
         logger.info("Fetching tickets by role...")
 
-        # 3 separate requests for user roles
-        tickets_requester = await _fetch_by_role(4, "Requester")
-        tickets_assignee = await _fetch_by_role(5, "Assignee")
-        tickets_observer = await _fetch_by_role(66, "Observer")
-
-        # Also fetch by group observer (field 65)
-        all_tickets = tickets_requester + tickets_assignee + tickets_observer
+        # 3 requests for user roles — стартуют сразу, параллельно со списком групп
+        roles_task = asyncio.gather(
+            _fetch_by_role(4, "Requester"),
+            _fetch_by_role(5, "Assignee"),
+            _fetch_by_role(66, "Observer"),
+        )
 
+        # Also fetch by group observer (field 65); список групп кэшируется в get_user_groups()
         group_ids = await self.get_user_groups()
-        for gid in group_ids:
-            group_tickets = await _fetch_by_role_group(65, gid, f"ObserverGroup-{gid}")
+        group_results = await asyncio.gather(*(
+            _fetch_by_role_group(65, gid, f"ObserverGroup-{gid}") for gid in group_ids
+        ))
+        tickets_requester, tickets_assignee, tickets_observer = await roles_task
+
+        all_tickets = tickets_requester + tickets_assignee + tickets_observer
+        for group_tickets in group_results:
             all_tickets.extend(group_tickets)
 
         # Merge and deduplicate by ID, filter out Closed (6)
@@ -416,14 +1271,25 @@ class GLPIClient:
         # Sort by ID descending
         result = sorted(merged.values(), key=lambda x: int(x.get("id", 0)), reverse=True)
 
-        await self._resolve_ticket_extra_fields(result)
+        await self.hydrate_tickets(result if detail_limit is None else result[:detail_limit])
 
         logger.info(f"Total unique active tickets: {len(result)}")
         return result
 
-    async def get_all_active_tickets(self):
+    async def get_all_active_tickets(self, modified_since=None, slim=False):
         """Получить ВСЕ активные тикеты в системе (статусы 1-5, не закрытые).
 
+        slim=True — только тонкая проекция (id, status, date_mod, priority) без
+        дочитывания деталей: монитор сам решает, каким тикетам нужен hydrate_tickets().
+
+        modified_since ("YYYY-MM-DD HH:MM:SS", время сервера GLPI) — инкрементальный
+        режим: только тикеты с date_mod (Field 19) позже этой отметки. Фильтр по
+        статусам тогда уходит во вложенную группу критериев: (1 OR ... OR 5) AND date_mod.
+
+        None — ошибка поиска, в т.ч. на середине пагинации. Частичный список не
+        возвращается: страницы идут по id, а не по date_mod, и монитор сдвинул бы
+        watermark за пределы непрочитанных страниц.
+
         В отличие от get_active_tickets(), не фильтрует по роли пользователя (Requester/
         Assignee/Observer) — используется фоновым монитором (check_tickets), которому нужно
         видеть новые/изменённые тикеты, даже если директор формально не участник (GLPI не
@@ -439,283 +1305,371 @@ class GLPIClient:
         sysadmin-bot (`services/glpi.py: get_active_tickets`, "Fetched N active tickets
         (statuses 1-5)"). НЕ возвращать `criteria[searchtype]=notequals` для этого поля.
         """
-        if not self.session_token:
-            await self.init_session()
+        await self._ensure_session()
 
         results = []
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/search/Ticket"
-                params = {
-                    "criteria[0][field]": 12,
-                    "criteria[0][searchtype]": "equals",
-                    "criteria[0][value]": 1,
-                    "forcedisplay[0]": 2,
-                    "forcedisplay[1]": 1,
-                    "forcedisplay[2]": 12,
-                    "forcedisplay[3]": 15,
-                    "forcedisplay[4]": 21,
-                    "forcedisplay[5]": 83,
-                    "forcedisplay[6]": 4,
-                    "forcedisplay[7]": 5,
-                    "range": "0-999",
-                    "sort": "2",
-                    "order": "DESC",
-                }
-                for i, st in enumerate([2, 3, 4, 5], start=1):
-                    params[f"criteria[{i}][link]"] = "OR"
-                    params[f"criteria[{i}][field]"] = 12
-                    params[f"criteria[{i}][searchtype]"] = "equals"
-                    params[f"criteria[{i}][value]"] = st
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status in [200, 206]:
-                        data = await resp.json()
-                        total = data.get("totalcount", 0)
-                        for item in data.get("data", []):
-                            try:
-                                status_val = int(item.get("12", 0))
-                            except (ValueError, TypeError):
-                                status_val = 0
-                            results.append({
-                                "id": item.get("2"),
-                                "title": item.get("1", "Без названия"),
-                                "status": status_val,
-                                "date": item.get("15", ""),
-                                "content": item.get("21", ""),
-                                "location_name": item.get("83", ""),
-                                "requester_name": item.get("4", ""),
-                                "technician_name": item.get("5", ""),
-                            })
-                        logger.info(f"  All active tickets: {len(results)} (statuses 1-5, total={total})")
-                    else:
-                        logger.warning(f"  All active tickets: HTTP {resp.status}")
+            params = {
+                "sort": "2",
+                "order": "DESC",
+            }
+            fields = self.SLIM_FIELDS if slim else list(dict.fromkeys(self.SLIM_FIELDS + self.DETAIL_FIELDS))
+            for i, field in enumerate(fields):
+                params[f"forcedisplay[{i}]"] = field
+            status_prefix = "criteria[0][criteria]" if modified_since else "criteria"
+            for i, st in enumerate([1, 2, 3, 4, 5]):
+                if i:
+                    params[f"{status_prefix}[{i}][link]"] = "OR"
+                params[f"{status_prefix}[{i}][field]"] = 12
+                params[f"{status_prefix}[{i}][searchtype]"] = "equals"
+                params[f"{status_prefix}[{i}][value]"] = st
+            if modified_since:
+                params["criteria[1][link]"] = "AND"
+                params["criteria[1][field]"] = 19  # date_mod
+                params["criteria[1][searchtype]"] = "morethan"
+                params["criteria[1][value]"] = modified_since
+            async for page in self._paginate("/search/Ticket", params):
+                results.extend(self._ticket_from_row(item) for item in page)
+            mode = f"modified since {modified_since}" if modified_since else "full"
+            logger.info(f"  All active tickets: {len(results)} (statuses 1-5, {mode})")
         except Exception as e:
             logger.error(f"  All active tickets error: {e}")
+            return None
 
-        await self._resolve_ticket_extra_fields(results)
+        if not slim:
+            await self._resolve_ticket_extra_fields(results)
 
         logger.info(f"Total unique active tickets: {len(results)}")
         return results
 
+    async def _gather_bounded(self, func, items):
+        """Выполнить func(item) для всех items параллельно, не более GLPI_MAX_CONCURRENCY одновременно.
+
+        Семафор создаётся на каждый вызов (а не общий на клиент), чтобы вложенные
+        fan-out'ы не могли заблокировать друг друга. Порядок результатов = порядок items.
+        """
+        sem = asyncio.Semaphore(Config.GLPI_MAX_CONCURRENCY)
+
+        async def _run(item):
+            async with sem:
+                return await func(item)
+
+        return await asyncio.gather(*(_run(item) for item in items))
+
+    @staticmethod
+    def _parse_id(value):
+        """ID из значения Search API (int, "21" или несколько ID через "$#$") → int | None"""
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if isinstance(value, str):
+            value = value.split("$#$")[0].strip()
+        try:
+            return int(value) or None
+        except (ValueError, TypeError):
+            return None
+
+    async def get_multiple_items(self, itemtype, ids, **params):
+        """Пакетное чтение объектов одного типа через /getMultipleItems → {id: item}.
+
+        N отдельных GET /{itemtype}/{id} превращаются в ceil(N / GLPI_BATCH_SIZE) запросов;
+        чанки идут параллельно (не более GLPI_MAX_CONCURRENCY). GLPI отвечает 404 на весь
+        пакет, если хоть одного объекта нет, — такой чанк дочитывается поштучно, а
+        отсутствующие объекты (404) просто не попадают в результат. Любой другой
+        отказ при поштучном чтении поднимает GLPIAPIError: иначе недоступный объект
+        был бы неотличим от удалённого (и, например, закэширован как негативный).
+        """
+        unique_ids = list(dict.fromkeys(i for i in (self._parse_id(x) for x in ids) if i))
+        size = Config.GLPI_BATCH_SIZE
+        chunks = [unique_ids[i:i + size] for i in range(0, len(unique_ids), size)]
+
+        async def _fetch_one(item_id):
+            status, data, _ = await self._request("GET", f"/{itemtype}/{item_id}", params=params or None)
+            if status == 200 and isinstance(data, dict):
+                return data
+            if status == 404:
+                return None
+            raise GLPIAPIError(f"{itemtype} #{item_id}: HTTP {status}")
+
+        async def _fetch_chunk(chunk):
+            query = dict(params)
+            for i, item_id in enumerate(chunk):
+                query[f"items[{i}][itemtype]"] = itemtype
+                query[f"items[{i}][items_id]"] = item_id
+            status, data, _ = await self._request("GET", "/getMultipleItems", params=query)
+            if status == 200 and isinstance(data, list):
+                return [item for item in data if isinstance(item, dict)]
+            if status == 404:
+                return [item for item in await self._gather_bounded(_fetch_one, chunk) if item]
+            raise GLPIAPIError(f"getMultipleItems {itemtype}: HTTP {status}")
+
+        items = {}
+        for chunk_items in await self._gather_bounded(_fetch_chunk, chunks):
+            for item in chunk_items:
+                item_id = self._parse_id(item.get("id"))
+                if item_id:
+                    items[item_id] = item
+        return items
+
+    async def _search_tickets_by_ids(self, ticket_ids, fields):
+        """Строки Search API для заданных тикетов (OR по Field 2) → {ticket_id: row}"""
+        unique_ids = list(dict.fromkeys(i for i in (self._parse_id(x) for x in ticket_ids) if i))
+        size = Config.GLPI_BATCH_SIZE
+        chunks = [unique_ids[i:i + size] for i in range(0, len(unique_ids), size)]
+
+        async def _search_chunk(chunk):
+            params = {f"forcedisplay[{i}]": field for i, field in enumerate(fields)}
+            for i, tid in enumerate(chunk):
+                if i:
+                    params[f"criteria[{i}][link]"] = "OR"
+                params[f"criteria[{i}][field]"] = 2
+                params[f"criteria[{i}][searchtype]"] = "equals"
+                params[f"criteria[{i}][value]"] = tid
+            rows = []
+            async for page in self._paginate("/search/Ticket", params):
+                rows.extend(page)
+            return rows
+
+        result = {}
+        for rows in await self._gather_bounded(_search_chunk, chunks):
+            for row in rows:
+                tid = self._parse_id(row.get("2"))
+                if tid:
+                    result[tid] = row
+        return result
+
+    async def get_tickets_by_ids(self, ticket_ids):
+        """Тонкая проекция (SLIM_FIELDS) заданных тикетов любого статуса.
+
+        Для плановой проверки отдельных тикетов монитором: один поиск на чанк
+        вместо опроса всех активных. Тикетов, которых нет в GLPI, в списке нет;
+        None — запрос не удался (отличать от «тикеты удалены»).
+        """
+        await self._ensure_session()
+        try:
+            rows = await self._search_tickets_by_ids(ticket_ids, self.SLIM_FIELDS)
+            return [self._ticket_from_row(row) for row in rows.values()]
+        except Exception as e:
+            logger.error(f"Error fetching tickets by ids: {e}")
+            return None
+
+    async def get_tickets_details(self, ticket_ids):
+        """Детали тикетов с именем заявителя → {ticket_id: ticket}.
+
+        Тикеты — через getMultipleItems, заявители (Field 4) — одним поиском по ID,
+        имена — одним пакетом. Вместо 3N запросов — по одному на каждый чанк.
+        Тикеты, которых нет в GLPI, в результат не попадают.
+        """
+        if not ticket_ids:
+            return {}
+        try:
+            tickets, rows = await asyncio.gather(
+                self.get_multiple_items("Ticket", ticket_ids, expand_dropdowns="true"),
+                self._search_tickets_by_ids(ticket_ids, [2, 4]),
+            )
+        except Exception as e:
+            logger.error(f"Error in get_tickets_details: {e}")
+            return {}
+
+        requester_ids = {tid: self._parse_id(rows.get(tid, {}).get("4")) for tid in tickets}
+        names = await self._get_names("user", [uid for uid in requester_ids.values() if uid])
+        for tid, ticket in tickets.items():
+            uid = requester_ids.get(tid)
+            if uid:
+                ticket['_users_id_requester'] = names.get(uid, f"User #{uid}")
+        return tickets
+
     async def _resolve_ticket_extra_fields(self, tickets):
         """Дозаполняет location/priority/date_creation/updater + имена requester/technician.
 
         Search API не возвращает location/priority надёжно (Field 83 = None), поэтому
-        для каждого тикета делаем прямой GET /Ticket/{id}. Используется и
+        тикеты дочитываются напрямую — пакетно через getMultipleItems, а имена локаций и
+        пользователей разрешаются тоже пакетно (_get_names). Используется и
         get_active_tickets(), и get_all_active_tickets() — общая логика, было продублировано.
+        Тикет, который не удалось дочитать, получает значения по умолчанию.
         """
-        for ticket in tickets:
-            tid = ticket.get("id")
+        if not tickets:
+            return
 
-            # Fetch extra fields from direct Ticket API (Search API returns None for location/priority)
-            try:
-                async with aiohttp.ClientSession() as api_session:
-                    ticket_url = f"{Config.GLPI_URL}/apirest.php/Ticket/{tid}"
-                    async with api_session.get(ticket_url, headers=self.get_headers()) as resp:
-                        if resp.status == 200:
-                            ticket_data = await resp.json()
-                            loc_id = ticket_data.get("locations_id")
-                            if loc_id and loc_id != 0:
-                                ticket["location_name"] = await self._get_location_name(loc_id)
-                            else:
-                                ticket["location_name"] = "Не указано"
-                            ticket["priority"] = ticket_data.get("priority", 3)
-                            ticket["date_creation"] = ticket_data.get("date_creation", "")
-                            ticket["users_id_lastupdater"] = ticket_data.get("users_id_lastupdater", 0)
-                        else:
-                            ticket["location_name"] = "Не указано"
-                            ticket["priority"] = 3
-                            ticket["date_creation"] = ""
-                            ticket["users_id_lastupdater"] = 0
-            except Exception as e:
-                logger.warning(f"Failed to fetch ticket details for {tid}: {e}")
+        try:
+            details = await self.get_multiple_items("Ticket", [t.get("id") for t in tickets])
+        except Exception as e:
+            logger.warning(f"Failed to fetch ticket details batch: {e}")
+            details = {}
+
+        requester_ids = {id(t): self._parse_id(t.get("requester_name")) for t in tickets}
+        technician_ids = {id(t): self._parse_id(t.get("technician_name")) for t in tickets}
+        location_ids = [d.get("locations_id") for d in details.values() if d.get("locations_id")]
+        user_ids = [uid for uid in list(requester_ids.values()) + list(technician_ids.values()) if uid]
+        locations, users = await asyncio.gather(
+            self._get_names("location", location_ids),
+            self._get_names("user", user_ids),
+        )
+
+        for ticket in tickets:
+            ticket_data = details.get(self._parse_id(ticket.get("id")))
+            if ticket_data:
+                loc_id = ticket_data.get("locations_id")
+                ticket["location_name"] = locations.get(loc_id, "Не указано") if loc_id else "Не указано"
+                ticket["priority"] = ticket_data.get("priority", 3)
+                ticket["date_creation"] = ticket_data.get("date_creation", "")
+                ticket["users_id_lastupdater"] = ticket_data.get("users_id_lastupdater", 0)
+            else:
                 ticket["location_name"] = "Не указано"
                 ticket["priority"] = 3
                 ticket["date_creation"] = ""
                 ticket["users_id_lastupdater"] = 0
 
-            # Requester ID -> Name (from Search API Field 4)
-            req_id = ticket.get("requester_name")
-            if req_id:
-                try:
-                    ticket["requester_name"] = await self._get_user_name(int(req_id))
-                except (ValueError, TypeError):
-                    ticket["requester_name"] = "Неизвестно"
+            # Requester / Technician ID -> Name (from Search API Fields 4 / 5)
+            req_id = requester_ids[id(ticket)]
+            ticket["requester_name"] = users.get(req_id, "Неизвестно") if req_id else "Неизвестно"
+            tech_id = technician_ids[id(ticket)]
+            ticket["technician_name"] = users.get(tech_id, "") if tech_id else ""
+
+    @staticmethod
+    def _format_name(kind, item_id, data):
+        """Человекочитаемое имя объекта GLPI (User/Location/Entity) из его JSON"""
+        if kind == "user":
+            # Формируем полное имя
+            firstname = data.get('firstname', '')
+            realname = data.get('realname', '')
+            if firstname and realname:
+                return f"{firstname} {realname}"
+            return data.get('name') or "Неизвестно"
+        if kind == "location":
+            return data.get("completename") or data.get("name") or f"Location #{item_id}"
+        return data.get('name', 'Неизвестно')
+
+    async def _get_names(self, kind, ids):
+        """Пакетное разрешение имён → {id: name}.
+
+        Попадания берутся из кэша, все промахи — одним getMultipleItems. Объекты,
+        которых нет в GLPI (404), кэшируются как негативные записи (как в
+        _get_user_name); при любой другой ошибке имена не кэшируются.
+        """
+        itemtype = self.NAME_ITEMTYPES[kind]
+        names, misses = {}, []
+        for item_id in dict.fromkeys(ids):
+            cached = self.names.get(kind, item_id)
+            if cached is not None:
+                names[item_id] = cached
             else:
-                ticket["requester_name"] = "Неизвестно"
+                misses.append(item_id)
+        if not misses:
+            return names
 
-            # Technician ID -> Name (from Search API Field 5)
-            tech_id = ticket.get("technician_name")
-            if tech_id:
-                try:
-                    ticket["technician_name"] = await self._get_user_name(int(tech_id))
-                except (ValueError, TypeError):
-                    ticket["technician_name"] = ""
+        try:
+            items = await self.get_multiple_items(itemtype, misses)
+        except Exception as e:
+            logger.error(f"Error fetching {itemtype} names: {e}")
+            items = None
+
+        for item_id in misses:
+            if items is None:
+                names[item_id] = f"{itemtype} #{item_id}"
+            elif item_id in items:
+                names[item_id] = self._format_name(kind, item_id, items[item_id])
+                self.names.put(kind, item_id, names[item_id])
             else:
-                ticket["technician_name"] = ""
+                names[item_id] = f"{itemtype} #{item_id}"
+                self.names.put(kind, item_id, names[item_id], negative=True)
+        return names
 
     async def _get_entity_name(self, entity_id):
         """Получить название филиала по ID"""
         if not entity_id:
             return "Неизвестно"
-        
+
+        cached = self.names.get("entity", entity_id)
+        if cached is not None:
+            return cached
+
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Entity/{entity_id}"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data.get('name', 'Неизвестно')
-                    return f"Entity #{entity_id}"
+            status, data, _ = await self._request("GET", f"/Entity/{entity_id}")
+            if status == 200:
+                name = self._format_name("entity", entity_id, data)
+                self.names.put("entity", entity_id, name)
+                return name
+            if status == 404:
+                self.names.put("entity", entity_id, f"Entity #{entity_id}", negative=True)
+            return f"Entity #{entity_id}"
         except Exception as e:
             logger.error(f"Error fetching entity name: {e}")
             return f"Entity #{entity_id}"
-    
+
     async def _get_user_name(self, user_id):
         """Получить имя пользователя по ID"""
         if not user_id:
             return "Неизвестно"
-        
+
+        cached = self.names.get("user", user_id)
+        if cached is not None:
+            return cached
+
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/User/{user_id}"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        # Формируем полное имя
-                        firstname = data.get('firstname', '')
-                        realname = data.get('realname', '')
-                        if firstname and realname:
-                            return f"{firstname} {realname}"
-                        elif data.get('name'):
-                            return data.get('name')
-                        return "Неизвестно"
-                    return f"User #{user_id}"
+            status, data, _ = await self._request("GET", f"/User/{user_id}")
+            if status == 200:
+                name = self._format_name("user", user_id, data)
+                self.names.put("user", user_id, name)
+                return name
+            if status == 404:
+                self.names.put("user", user_id, f"User #{user_id}", negative=True)
+            return f"User #{user_id}"
         except Exception as e:
             logger.error(f"Error fetching user name: {e}")
             return f"User #{user_id}"
-    
+
     async def _get_user_profile(self, user_id):
         """Получить профиль пользователя (включая locations_id)"""
         if not user_id:
             return None
-        
+
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/User/{user_id}"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        return await resp.json()
-                    return None
+            status, data, _ = await self._request("GET", f"/User/{user_id}")
+            if status == 200:
+                return data
+            return None
         except Exception as e:
             logger.error(f"Error fetching user profile: {e}")
             return None
-    
+
     async def get_user_groups(self):
-        """Получить список групп пользователя"""
-        if not self.session_token:
-            await self.init_session()
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/User/{Config.GLPI_MY_ID}/Group_User"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        group_ids = [item.get("groups_id") for item in data if item.get("groups_id")]
-                        logger.info(f"User groups: {group_ids}")
-                        return group_ids
-                    return []
-        except Exception as e:
-            logger.error(f"Error fetching user groups: {e}")
-            return []
-    
-    async def _get_location_name(self, location_id):
-        """Получить название локации по ID"""
-        if not location_id:
-            return "Неизвестно"
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Location/{location_id}"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data.get("completename") or data.get("name") or f"Location #{location_id}"
-                    return f"Location #{location_id}"
-        except Exception as e:
-            logger.error(f"Error fetching location: {e}")
-            return f"Location #{location_id}"
+        """Получить список групп пользователя (кэшируется на GROUPS_TTL секунд)"""
+        if self._groups_cache is not None and self._groups_cache[1] > time.time():
+            return self._groups_cache[0]
 
-    async def _get_ticket_solution(self, ticket_id):
-        """Получить последнее решение тикета (ITILSolution)"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/ITILSolution"
-                params = {"range": "0-1", "order": "DESC", "sort": "id"}
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data and isinstance(data, list) and len(data) > 0:
-                            sol = data[0]
-                            user_id = sol.get("users_id", 0)
-                            content = sol.get("content", "")
-                            user_name = await self._get_user_name(user_id) if user_id else "Неизвестно"
-                            return {
-                                "user_name": user_name,
-                                "content": self.clean_html_to_text(content)
-                            }
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching solution for ticket {ticket_id}: {e}")
-            return None
+        await self._ensure_session()
 
-    async def _get_ticket_followup(self, ticket_id):
-        """Получить последний комментарий (ITILFollowup) тикета"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/ITILFollowup"
-                params = {"range": "0-1", "order": "DESC", "sort": "id"}
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data and isinstance(data, list) and len(data) > 0:
-                            fu = data[0]
-                            user_id = fu.get("users_id", 0)
-                            content = fu.get("content", "")
-                            user_name = await self._get_user_name(user_id) if user_id else "GLPI"
-                            return {
-                                "user_name": user_name,
-                                "content": self.clean_html_to_text(content)
-                            }
-            return None
+            status, data, _ = await self._request("GET", f"/User/{Config.GLPI_MY_ID}/Group_User")
+            if status == 200:
+                group_ids = [item.get("groups_id") for item in data if item.get("groups_id")]
+                logger.info(f"User groups: {group_ids}")
+                self._groups_cache = (group_ids, time.time() + self.GROUPS_TTL)
+                return group_ids
+            return []
         except Exception as e:
-            logger.error(f"Error fetching followup for ticket {ticket_id}: {e}")
-            return None
+            logger.error(f"Error fetching user groups: {e}")
+            return []
 
     async def get_ticket_followups(self, ticket_id):
         """Получить ВСЕ комментарии (ITILFollowup) тикета"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/ITILFollowup"
-                params = {"range": "0-99"}
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data and isinstance(data, list):
-                            result = []
-                            for fu in data:
-                                user_id = fu.get("users_id", 0)
-                                content = fu.get("content", "")
-                                date_creation = fu.get("date_creation", "")
-                                user_name = await self._get_user_name(user_id) if user_id else "GLPI"
-                                result.append({
-                                    "user_name": user_name,
-                                    "content": self.clean_html_to_text(content),
-                                    "date_creation": date_creation
-                                })
-                            return result
-            return []
+            result = []
+            async for page in self._paginate(f"/Ticket/{ticket_id}/ITILFollowup"):
+                # Имена авторов страницы — одним пакетом, а не запросом на запись
+                user_ids = [self._parse_id(fu.get("users_id")) for fu in page]
+                names = await self._get_names("user", [uid for uid in user_ids if uid])
+                for fu, user_id in zip(page, user_ids):
+                    content = fu.get("content", "")
+                    date_creation = fu.get("date_creation", "")
+                    user_name = names.get(user_id) if user_id else "GLPI"
+                    result.append({
+                        "id": fu.get("id"),
+                        "user_name": user_name,
+                        "content": self.clean_html_to_text(content),
+                        "date_creation": date_creation
+                    })
+            return result
         except Exception as e:
             logger.error(f"Error fetching followups for ticket {ticket_id}: {e}")
             return []
@@ -723,26 +1677,22 @@ class GLPIClient:
     async def get_ticket_solutions(self, ticket_id):
         """Получить ВСЕ решения (ITILSolution) тикета"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/ITILSolution"
-                params = {"range": "0-99"}
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data and isinstance(data, list):
-                            result = []
-                            for sol in data:
-                                user_id = sol.get("users_id", 0)
-                                content = sol.get("content", "")
-                                date_creation = sol.get("date_creation", "")
-                                user_name = await self._get_user_name(user_id) if user_id else "Неизвестно"
-                                result.append({
-                                    "user_name": user_name,
-                                    "content": self.clean_html_to_text(content),
-                                    "date_creation": date_creation
-                                })
-                            return result
-            return []
+            result = []
+            async for page in self._paginate(f"/Ticket/{ticket_id}/ITILSolution"):
+                # Имена авторов страницы — одним пакетом, а не запросом на запись
+                user_ids = [self._parse_id(sol.get("users_id")) for sol in page]
+                names = await self._get_names("user", [uid for uid in user_ids if uid])
+                for sol, user_id in zip(page, user_ids):
+                    content = sol.get("content", "")
+                    date_creation = sol.get("date_creation", "")
+                    user_name = names.get(user_id) if user_id else "Неизвестно"
+                    result.append({
+                        "id": sol.get("id"),
+                        "user_name": user_name,
+                        "content": self.clean_html_to_text(content),
+                        "date_creation": date_creation
+                    })
+            return result
         except Exception as e:
             logger.error(f"Error fetching solutions for ticket {ticket_id}: {e}")
             return []
@@ -756,116 +1706,98 @@ class GLPIClient:
         not `status`.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/TicketTask"
-                params = {"range": "0-49"}
-                async with session.get(url, headers=self.get_headers(), params=params) as resp:
-                    if resp.status == 200:
-                        tasks = await resp.json()
-                        return tasks if isinstance(tasks, list) else []
-                    logger.warning(f"Error fetching tasks for ticket {ticket_id}: HTTP {resp.status}")
-            return []
+            tasks = []
+            async for page in self._paginate(f"/Ticket/{ticket_id}/TicketTask"):
+                tasks.extend(page)
+            return tasks
         except Exception as e:
             logger.error(f"Error fetching tasks for ticket {ticket_id}: {e}")
             return []
 
-    async def get_ticket_technician(self, ticket_id):
-        """Получить имя назначенного техника (Ticket_User type=2)"""
+    async def get_ticket_users(self, ticket_id):
+        """Получить участников тикета (Ticket_User: type 1 — заявитель, 2 — техник)"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/Ticket_User"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        users = await resp.json()
-                        for user in users:
-                            if user.get("type") == 2:
-                                uid = user.get("users_id")
-                                return await self._get_user_name(int(uid)) if uid else None
-            return None
+            status, users, _ = await self._request("GET", f"/Ticket/{ticket_id}/Ticket_User")
+            if status == 200:
+                return users if isinstance(users, list) else []
+            return []
         except Exception as e:
-            logger.error(f"Error fetching technician for ticket {ticket_id}: {e}")
-            return None
+            logger.error(f"Error fetching users for ticket {ticket_id}: {e}")
+            return []
+
+    async def get_ticket_technician(self, ticket_id, ticket_users=None):
+        """Получить имя назначенного техника (Ticket_User type=2).
+
+        ticket_users — уже полученный список Ticket_User, чтобы не запрашивать его повторно.
+        """
+        if ticket_users is None:
+            ticket_users = await self.get_ticket_users(ticket_id)
+        for user in ticket_users:
+            if user.get("type") == 2:
+                uid = user.get("users_id")
+                return await self._get_user_name(int(uid)) if uid else None
+        return None
 
     async def get_ticket_validations(self, ticket_id):
         """Получить все согласования тикета"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/TicketValidation"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        vals = await resp.json()
-                        return vals if isinstance(vals, list) else []
+            status, vals, _ = await self._request("GET", f"/Ticket/{ticket_id}/TicketValidation")
+            if status == 200:
+                return vals if isinstance(vals, list) else []
             return []
         except Exception as e:
             logger.error(f"Error fetching validations for ticket {ticket_id}: {e}")
             return []
 
     async def _ensure_session(self):
-        """Проверить сессию, при 401/403 — перелогиниться"""
-        if not self.session_token:
-            return await self.init_session()
-        return True
+        """Войти в GLPI, если сессии ещё нет (отказы по сессии обрабатывает _request)"""
+        if self.session_token:
+            return True
+        return await self.reauthenticate(None)
 
     async def _api_request(self, method, endpoint, **kwargs):
-        """Unified API request with auto-reauth on 401/403"""
+        """Unified API request (re-auth on 401 is handled in _request)"""
         if not await self._ensure_session():
             return None
-        for attempt in range(2):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    url = f"{Config.GLPI_URL}/apirest.php{endpoint}"
-                    func = getattr(session, method)
-                    async with func(url, headers=self.get_headers(), **kwargs) as resp:
-                        if resp.status in [401, 403] and attempt == 0:
-                            logger.warning(f"GLPI session expired ({resp.status}), re-authenticating...")
-                            await self.init_session()
-                            continue
-                        if resp.status in [200, 201, 206]:
-                            return await resp.json()
-                        return None
-            except Exception as e:
-                logger.error(f"API request {method} {endpoint}: {e}")
-                if attempt == 0:
-                    await self.init_session()
-                    continue
-                return None
-        return None
+        try:
+            status, data, _ = await self._request(method.upper(), endpoint, **kwargs)
+            if status in [200, 201, 206]:
+                return data
+            return None
+        except Exception as e:
+            logger.error(f"API request {method} {endpoint}: {e}")
+            return None
 
     async def diagnose_search_options(self):
         """Диагностика SearchOptions для TicketValidation (проверка полей 3, 4, 7)"""
-        if not self.session_token:
-            await self.init_session()
-        
+        await self._ensure_session()
+
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/listSearchOptions/TicketValidation"
-                async with session.get(url, headers=self.get_headers()) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        
-                        # Проверяем ключевые поля
-                        field_3 = data.get('3', {})  # Status
-                        field_4 = data.get('4', {})  # Date
-                        field_7 = data.get('7', {})  # Validator
-                        
-                        logger.info("🔍 GLPI SearchOptions Diagnostic:")
-                        logger.info(f"  Field 3 (Status): {field_3.get('name', 'N/A')} - {field_3.get('field', 'N/A')}")
-                        logger.info(f"  Field 4 (Date): {field_4.get('name', 'N/A')} - {field_4.get('field', 'N/A')}")
-                        logger.info(f"  Field 7 (Validator): {field_7.get('name', 'N/A')} - UID: {field_7.get('uid', 'N/A')}")
-                        logger.info(f"✅ Using Field 7 for users_id_validate search")
-                        
-                        return True
-                    else:
-                        logger.warning(f"⚠️ Failed to fetch SearchOptions: HTTP {resp.status}")
-                        return False
+            status, data, _ = await self._request("GET", "/listSearchOptions/TicketValidation")
+            if status == 200:
+                # Проверяем ключевые поля
+                field_3 = data.get('3', {})  # Status
+                field_4 = data.get('4', {})  # Date
+                field_7 = data.get('7', {})  # Validator
+
+                logger.info("🔍 GLPI SearchOptions Diagnostic:")
+                logger.info(f"  Field 3 (Status): {field_3.get('name', 'N/A')} - {field_3.get('field', 'N/A')}")
+                logger.info(f"  Field 4 (Date): {field_4.get('name', 'N/A')} - {field_4.get('field', 'N/A')}")
+                logger.info(f"  Field 7 (Validator): {field_7.get('name', 'N/A')} - UID: {field_7.get('uid', 'N/A')}")
+                logger.info(f"✅ Using Field 7 for users_id_validate search")
+
+                return True
+            else:
+                logger.warning(f"⚠️ Failed to fetch SearchOptions: HTTP {status}")
+                return False
         except Exception as e:
             logger.error(f"❌ Error in diagnose_search_options: {e}")
             return False
 
     async def update_validation(self, validation_id, status, comment=""):
         """Обновить статус валидации (3-Approve, 4-Refuse)"""
-        if not self.session_token: await self.init_session()
-        
+        await self._ensure_session()
+
         payload = {
             "input": {
                 "id": validation_id,
@@ -873,20 +1805,17 @@ class GLPIClient:
                 "comment_validation": comment
             }
         }
-        
+
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/TicketValidation/{validation_id}"
-                async with session.put(url, headers=self.get_headers(), json=payload) as resp:
-                    return resp.status in [200, 201]
+            resp_status, _, _ = await self._request("PUT", f"/TicketValidation/{validation_id}", json=payload)
+            return resp_status in [200, 201]
         except Exception as e:
             logger.error(f"Update validation error: {e}")
             return False
 
     async def add_ticket_followup(self, ticket_id, content):
         """Добавить комментарий (followup) к тикету"""
-        if not self.session_token:
-            await self.init_session()
+        await self._ensure_session()
         payload = {
             "input": {
                 "items_id": ticket_id,
@@ -896,22 +1825,19 @@ class GLPIClient:
             }
         }
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket/{ticket_id}/ITILFollowup"
-                async with session.post(url, headers=self.get_headers(), json=payload) as resp:
-                    if resp.status in [200, 201]:
-                        logger.info(f"Followup added to ticket #{ticket_id}")
-                        return True
-                    logger.error(f"Failed to add followup to #{ticket_id}: {resp.status}")
-                    return False
+            status, _, _ = await self._request("POST", f"/Ticket/{ticket_id}/ITILFollowup", json=payload)
+            if status in [200, 201]:
+                logger.info(f"Followup added to ticket #{ticket_id}")
+                return True
+            logger.error(f"Failed to add followup to #{ticket_id}: {status}")
+            return False
         except Exception as e:
             logger.error(f"Error adding followup to ticket {ticket_id}: {e}")
             return False
 
     async def create_validation(self, ticket_id, validator_id, comment=""):
         """Создать согласование (TicketValidation) для другого пользователя"""
-        if not self.session_token:
-            await self.init_session()
+        await self._ensure_session()
         payload = {
             "input": {
                 "tickets_id": ticket_id,
@@ -921,35 +1847,31 @@ class GLPIClient:
             }
         }
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/TicketValidation"
-                async with session.post(url, headers=self.get_headers(), json=payload) as resp:
-                    if resp.status in [200, 201]:
-                        data = await resp.json()
-                        val_id = data.get("id")
-                        logger.info(f"Validation #{val_id} created for user {validator_id} on ticket #{ticket_id}")
-                        return val_id
-                    logger.error(f"Failed to create validation: {resp.status}")
-                    return None
+            status, data, _ = await self._request("POST", "/TicketValidation", json=payload)
+            if status in [200, 201]:
+                val_id = data.get("id")
+                logger.info(f"Validation #{val_id} created for user {validator_id} on ticket #{ticket_id}")
+                return val_id
+            logger.error(f"Failed to create validation: {status}")
+            return None
         except Exception as e:
             logger.error(f"Error creating validation for ticket {ticket_id}: {e}")
             return None
 
     async def create_ticket(self, title, content, ticket_type=2):
         """Создание тикета с корректным указанием автора, локации и наблюдателя
-        
+
         Args:
             title: Заголовок тикета
             content: Описание тикета
             ticket_type: Тип заявки (1=Инцидент, 2=Запрос). По умолчанию Запрос.
         """
-        if not self.session_token:
-            await self.init_session()
-        
+        await self._ensure_session()
+
         # Получаем профиль пользователя для locations_id
         user_profile = await self._get_user_profile(Config.GLPI_MY_ID)
         locations_id = user_profile.get("locations_id", 0) if user_profile else 0
-        
+
         payload = {
             "input": {
                 "name": title,
@@ -963,41 +1885,248 @@ class GLPIClient:
                 "_groups_id_observer": [1]  # Группа Administrators как наблюдатель
             }
         }
-        
+
         logger.info(f"Creating ticket with locations_id={locations_id}, requester={Config.GLPI_MY_ID}")
-        
+
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{Config.GLPI_URL}/apirest.php/Ticket"
-                async with session.post(url, headers=self.get_headers(), json=payload) as resp:
-                    if resp.status == 201:
-                        data = await resp.json()
-                        ticket_id = data.get("id")
-                        logger.info(f"✅ Ticket #{ticket_id} created by Director (ID: {Config.GLPI_MY_ID})")
-                        return ticket_id
-                    else:
-                        error_text = await resp.text()
-                        logger.error(f"Failed to create ticket: {resp.status} - {error_text}")
-                    return None
+            status, data, _ = await self._request("POST", "/Ticket", json=payload)
+            if status == 201:
+                ticket_id = data.get("id")
+                logger.info(f"✅ Ticket #{ticket_id} created by Director (ID: {Config.GLPI_MY_ID})")
+                return ticket_id
+            else:
+                logger.error(f"Failed to create ticket: {status} - {data}")
+            return None
         except Exception as e:
             logger.error(f"Error creating ticket: {e}")
             return None
 
 # === DATABASE ===
-def init_db():
+async def init_db():
     if not os.path.exists(DATABASE_PATH.parent):
         os.makedirs(DATABASE_PATH.parent)
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.execute("CREATE TABLE IF NOT EXISTS processed_validations (id INTEGER PRIMARY KEY, glpi_id INTEGER UNIQUE)")
+    await storage.run(_create_schema)
+
+def _create_schema(conn):
+    # Отметки «уже уведомляли» (DedupStore); ticket_id — чтобы забывать закрытые тикеты
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notified (
+            kind TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            ticket_id INTEGER,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (kind, item_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notified_ticket ON notified (ticket_id)")
+    # Перенос из старой таблицы processed_validations (без ticket_id)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'processed_validations'").fetchone():
         conn.execute("""
-            CREATE TABLE IF NOT EXISTS tickets (
-                id INTEGER PRIMARY KEY,
-                glpi_id INTEGER UNIQUE,
-                status INTEGER,
-                title TEXT,
-                last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            INSERT OR IGNORE INTO notified (kind, item_id, ticket_id, created_at)
+            SELECT 'validation', glpi_id, NULL, strftime('%s', 'now') FROM processed_validations
         """)
+        conn.execute("DROP TABLE processed_validations")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY,
+            glpi_id INTEGER UNIQUE,
+            status INTEGER,
+            title TEXT,
+            last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS name_cache (
+            kind TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            name TEXT,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (kind, item_id)
+        )
+    """)
+    # Снимок полей для fingerprint-сравнения (check_tickets); добавлены к старой схеме
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tickets)")}
+    for column, column_type in (("priority", "INTEGER"), ("technician", "TEXT"), ("validation", "INTEGER"),
+                                ("date_mod", "TEXT"), ("fingerprint", "TEXT")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE tickets ADD COLUMN {column} {column_type}")
+    # Служебное состояние монитора (watermark'и, время полной сверки и т.п.)
+    conn.execute("CREATE TABLE IF NOT EXISTS monitor_state (key TEXT PRIMARY KEY, value TEXT)")
+    # Согласования директора, ожидающие решения (перепроверяются каждый цикл)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pending_validations (
+            glpi_id INTEGER PRIMARY KEY,
+            ticket_id INTEGER,
+            comment_submission TEXT
+        )
+    """)
+    # Готовые уведомления, ещё не доставленные в Telegram (разбирает Outbox)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            reply_markup TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL
+        )
+    """)
+    # Сводки массовых изменений: что разворачивать по кнопке «Подробно»
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS digests (
+            id TEXT PRIMARY KEY,
+            items TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+
+async def get_state(key, default=None):
+    """Прочитать значение из monitor_state"""
+    row = await storage.fetchone("SELECT value FROM monitor_state WHERE key = ?", (key,))
+    return row[0] if row else default
+
+async def set_state(key, value):
+    """Записать значение в monitor_state"""
+    await storage.execute("INSERT OR REPLACE INTO monitor_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+async def load_pending_validations():
+    """Известные ожидающие согласования: {glpi_id: {id, ticket_id, comment_submission}}"""
+    rows = await storage.fetchall("SELECT glpi_id, ticket_id, comment_submission FROM pending_validations")
+    return {
+        row[0]: {'id': row[0], 'ticket_id': row[1], 'comment_submission': row[2] or ''}
+        for row in rows
+    }
+
+async def save_pending_validations(validations):
+    """Заменить набор известных ожидающих согласований"""
+    rows = [(v['id'], v['ticket_id'], v.get('comment_submission', '')) for v in validations]
+
+    def _save(conn):
+        conn.execute("DELETE FROM pending_validations")
+        conn.executemany(
+            "INSERT INTO pending_validations (glpi_id, ticket_id, comment_submission) VALUES (?, ?, ?)",
+            rows
+        )
+
+    await storage.run(_save)
+
+async def load_closed_ticket_ids(ticket_ids):
+    """Какие из ticket_ids записаны в tickets закрытыми (status 6) → set"""
+    ids = list(dict.fromkeys(t for t in ticket_ids if t))
+
+    def _load(conn):
+        closed = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            closed.update(row[0] for row in conn.execute(
+                f"SELECT glpi_id FROM tickets WHERE status = 6 AND glpi_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return closed
+
+    return await storage.run(_load) if ids else set()
+
+async def load_ticket_states(ticket_ids=None):
+    """Сохранённые снимки тикетов одним запросом: {glpi_id: {status, priority, ..., fingerprint}}
+
+    ticket_ids — только эти тикеты (плановая проверка): таблица хранит всю
+    историю, и читать её целиком ради пары ID незачем.
+    """
+    sql = "SELECT glpi_id, status, priority, technician, validation, date_mod, fingerprint FROM tickets"
+    if ticket_ids is None:
+        rows = await storage.fetchall(sql)
+    else:
+        ids = list(dict.fromkeys(ticket_ids))
+
+        def _load(conn):
+            rows = []
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows += conn.execute(f"{sql} WHERE glpi_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            return rows
+
+        rows = await storage.run(_load)
+    return {
+        row[0]: dict(zip(("status", "priority", "technician", "validation", "date_mod", "fingerprint"), row[1:]))
+        for row in rows
+    }
+
+def outbox_message(text, reply_markup=None, chat_id=None):
+    """Строка для outbox: уведомление директору (по умолчанию) в HTML"""
+    markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup else None
+    return (chat_id or Config.ADMIN_ID, text, markup, time.time())
+
+def _enqueue(conn, messages):
+    conn.executemany(
+        "INSERT INTO outbox (chat_id, text, reply_markup, created_at) VALUES (?, ?, ?, ?)", messages
+    )
+
+async def enqueue_messages(messages):
+    """Поставить уведомления (outbox_message) в outbox"""
+    if messages:
+        await storage.run(_enqueue, messages)
+
+async def save_ticket_changes(rows, messages=(), digests=()):
+    """Записать накопленные за цикл снимки тикетов одной транзакцией.
+
+    rows — [(glpi_id, status, title, priority, technician, validation, date_mod, fingerprint)];
+    title=None оставляет прежний заголовок (для тихих обновлений без дочитывания).
+    messages — уведомления (outbox_message) в той же транзакции: снимок и
+    уведомление о нём фиксируются вместе или не фиксируются вовсе.
+    digests — [(key, items_json, created_at)] для кнопок «Подробно» в сводках.
+    """
+    if not rows and not messages and not digests:
+        return
+
+    def _save(conn):
+        _save_ticket_rows(conn, rows)
+        _enqueue(conn, messages)
+        if digests:
+            conn.executemany("INSERT INTO digests (id, items, created_at) VALUES (?, ?, ?)", digests)
+            conn.execute("DELETE FROM digests WHERE created_at < ?", (time.time() - Config.DIGEST_TTL_DAYS * 86400,))
+
+    await storage.run(_save)
+
+def _save_ticket_rows(conn, rows):
+    conn.executemany("""
+        INSERT INTO tickets (glpi_id, status, title, priority, technician, validation, date_mod, fingerprint)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(glpi_id) DO UPDATE SET
+            status = excluded.status,
+            title = COALESCE(excluded.title, tickets.title),
+            priority = excluded.priority,
+            technician = excluded.technician,
+            validation = excluded.validation,
+            date_mod = excluded.date_mod,
+            fingerprint = excluded.fingerprint,
+            last_update = CURRENT_TIMESTAMP
+    """, rows)
+
+async def mark_tickets_closed(ticket_ids):
+    """Пометить тикеты закрытыми без уведомления (исчезли из GLPI)"""
+    await storage.executemany(
+        "UPDATE tickets SET status = 6, fingerprint = NULL, last_update = CURRENT_TIMESTAMP WHERE glpi_id = ?",
+        [(t,) for t in ticket_ids]
+    )
+
+async def load_digest(key):
+    """Элементы сводки по ключу из кнопки → list | None (нет или устарела)"""
+    row = await storage.fetchone("SELECT items FROM digests WHERE id = ?", (key,))
+    return json.loads(row[0]) if row else None
+
+async def save_notified(rows, messages=()):
+    """Записать отметки DedupStore.mark() и поставить уведомления в outbox (одной транзакцией)"""
+    if not rows and not messages:
+        return
+
+    def _save(conn):
+        conn.executemany(
+            "INSERT OR IGNORE INTO notified (kind, item_id, ticket_id, created_at) VALUES (?, ?, ?, ?)", rows
+        )
+        _enqueue(conn, messages)
+
+    await storage.run(_save)
 
 # === STATES ===
 class Form(StatesGroup):
@@ -1013,6 +2142,123 @@ dp = Dispatcher(storage=MemoryStorage())
 router = Router()
 glpi = GLPIClient()
 
+# === NOTIFICATION OUTBOX ===
+class Outbox:
+    """Доставка уведомлений из таблицы outbox в Telegram отдельным воркером.
+
+    Мониторинг только пишет готовые сообщения в outbox (в одной транзакции с
+    состоянием) и не ждёт Telegram: всплеск из 50 изменений больше не держит
+    цикл 25+ секунд на sleep(0.5). Воркер отправляет по порядку через token
+    bucket (TG_SEND_RATE/сек, всплеск TG_SEND_BURST), на RetryAfter ждёт
+    указанное Telegram время, временные ошибки (сеть, 5xx) повторяет с
+    экспоненциальной паузой до OUTBOX_MAX_ATTEMPTS раз. Сообщение, которое
+    Telegram отверг окончательно (400/403), удаляется с записью в лог.
+    Неотправленное переживает рестарт.
+    """
+
+    BATCH = 20
+
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.stats = Counter()
+        self._wakeup = asyncio.Event()
+
+    def wake(self):
+        """Сообщить воркеру о новых сообщениях"""
+        self._wakeup.set()
+
+    async def _due(self, ignore_schedule=False):
+        return await storage.fetchall(
+            "SELECT id, chat_id, text, reply_markup, attempts FROM outbox "
+            "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+            (float("inf") if ignore_schedule else time.time(), self.BATCH)
+        )
+
+    async def _send(self, row):
+        """Отправить одну запись → пауза до следующей попытки (0 — можно продолжать)"""
+        msg_id, chat_id, text, markup_json, attempts = row
+        wait = self.bucket.take()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self.bucket.take()
+        markup = InlineKeyboardMarkup.model_validate_json(markup_json) if markup_json else None
+        try:
+            await bot.send_message(chat_id, text, parse_mode="HTML", reply_markup=markup)
+        except TelegramRetryAfter as e:
+            self.stats["retry_after"] += 1
+            logger.warning(f"⏳ Telegram flood control: retry outbox #{msg_id} in {e.retry_after}s")
+            return e.retry_after
+        except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError, aiohttp.ClientError) as e:
+            attempts += 1
+            if attempts >= Config.OUTBOX_MAX_ATTEMPTS:
+                logger.error(f"❌ Уведомление #{msg_id} не доставлено после {attempts} попыток, удалено: {e}")
+                await storage.execute("DELETE FROM outbox WHERE id = ?", (msg_id,))
+                self.stats["dropped"] += 1
+                return 0
+            delay = min(5 * 2 ** (attempts - 1), 300)
+            logger.warning(f"⚠️ Telegram недоступен ({e}), повтор уведомления #{msg_id} через {delay}s")
+            await storage.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, str(e), msg_id)
+            )
+            self.stats["retried"] += 1
+            return delay
+        except TelegramAPIError as e:
+            logger.error(f"❌ Telegram отклонил уведомление #{msg_id}, удалено: {e}")
+            await storage.execute("DELETE FROM outbox WHERE id = ?", (msg_id,))
+            self.stats["rejected"] += 1
+            return 0
+        await storage.execute("DELETE FROM outbox WHERE id = ?", (msg_id,))
+        self.stats["sent"] += 1
+        return 0
+
+    async def _drain(self, ignore_schedule=False):
+        """Отправлять, пока есть готовые записи → пауза перед следующей попыткой (0 — очередь пуста)"""
+        while True:
+            rows = await self._due(ignore_schedule)
+            if not rows:
+                return 0
+            for row in rows:
+                pause = await self._send(row)
+                if pause:
+                    return pause
+
+    async def run(self):
+        """Воркер: разбирает outbox, пока не отменят"""
+        while True:
+            try:
+                self._wakeup.clear()
+                pause = await self._drain()
+                if pause:
+                    # RetryAfter / сбой сети: новые сообщения эту паузу не прерывают
+                    await asyncio.sleep(pause)
+                    continue
+                row = await storage.fetchone("SELECT MIN(next_attempt_at) FROM outbox")
+                idle = max(row[0] - time.time(), 0.1) if row and row[0] is not None else None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[outbox] worker error: {e}", exc_info=True)
+                idle = 5
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), idle)
+            except asyncio.TimeoutError:
+                pass
+
+    async def flush(self, timeout):
+        """Досылка при остановке: всё, что успеет за timeout сек; остальное — при следующем запуске"""
+        try:
+            await asyncio.wait_for(self._drain(ignore_schedule=True), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            logger.error(f"[outbox] flush failed: {e}")
+        row = await storage.fetchone("SELECT COUNT(*) FROM outbox")
+        if row and row[0]:
+            logger.warning(f"📮 В outbox осталось {row[0]} уведомлений — будут отправлены после запуска")
+
+outbox = Outbox(Config.TG_SEND_RATE, Config.TG_SEND_BURST)
+
 # === HANDLERS ===
 
 def get_main_menu_kb():
@@ -1035,19 +2281,18 @@ async def callback_main_menu(call: CallbackQuery, state: FSMContext):
     await state.clear()
     await call.message.answer("🏠 Главное меню", reply_markup=get_main_menu_kb())
 
-@router.message(Command("approvals"))
-async def cmd_approvals(message: Message):
-    """Команда /approvals - показать все согласования"""
-    if message.from_user.id != Config.ADMIN_ID:
-        return
-
-    # Создаём фейковый CallbackQuery для переиспользования логики
-    validations = await glpi.get_all_pending_validations()
+APPROVALS_OVERVIEW_LIMIT = 10
+# Пустой ответ при разомкнутом circuit breaker — это не «ничего нет», а «GLPI не ответил»
+GLPI_UNAVAILABLE_TEXT = "⚠️ GLPI временно недоступен, попробуйте позже."
 
-    if not validations:
-        await message.answer("✅ Нет ожидающих согласований.")
-        return
+async def build_approvals_overview():
+    """Сводка ожидающих согласований для /approvals и кнопки «Согласования».
 
+    Возвращает (text, kb) или (text, None), если показывать нечего. Тикеты
+    дочитываются пакетами (get_tickets_details) ровно на столько карточек,
+    сколько ещё не хватает до лимита, — а не по запросу на каждое согласование.
+    """
+    # Статусы для отображения
     status_info = {
         1: ("🟢", "Новый"),
         2: ("🟡", "В работе"),
@@ -1058,61 +2303,100 @@ async def cmd_approvals(message: Message):
 
     lines = ["📋 <b>СТАТУС СОГЛАСОВАНИЙ</b>", ""]
     shown_count = 0
+    pending_seen = 0
+    has_more = False
 
-    for val in validations:
-        if shown_count >= 10:
+    # Поток согласований: останавливаемся, как только набрали 10 карточек
+    async for page in glpi.iter_all_pending_validations():
+        if shown_count >= APPROVALS_OVERVIEW_LIMIT:
+            has_more = True
             break
+        pending_seen += len(page)
+        while page and shown_count < APPROVALS_OVERVIEW_LIMIT:
+            batch = page[:APPROVALS_OVERVIEW_LIMIT - shown_count]
+            page = page[len(batch):]
+            tickets = await glpi.get_tickets_details([val["ticket_id"] for val in batch])
+
+            for val in batch:
+                ticket_id = val.get("ticket_id", "?")
+                validator_name = val.get("validator_name", "Неизвестно")
+                is_mine = val.get("is_mine", False)
+
+                # Пропускаем если тикет не найден (404) или удалён
+                ticket = tickets.get(glpi._parse_id(ticket_id))
+                if not ticket or ticket.get("is_deleted") == 1:
+                    continue
 
-        ticket_id = val.get("ticket_id", "?")
-        validator_name = val.get("validator_name", "Неизвестно")
-        is_mine = val.get("is_mine", False)
-
-        ticket = await glpi.get_ticket_details(ticket_id)
-        if not ticket or ticket.get("is_deleted") == 1:
-            continue
-
-        ticket_status = ticket.get("status", 0)
-        try:
-            ticket_status = int(ticket_status)
-        except:
-            ticket_status = 0
+                # Пропускаем закрытые тикеты
+                ticket_status = ticket.get("status", 0)
+                try:
+                    ticket_status = int(ticket_status)
+                except (ValueError, TypeError):
+                    ticket_status = 0
 
-        if ticket_status == 6:
-            continue
+                if ticket_status == 6:  # Closed
+                    continue
 
-        title = html.escape(str(ticket.get("name", "Без названия"))[:45])
-        date_str = str(ticket.get("date_creation", "") or "")[:10]
-        raw_content = ticket.get("content", "")
-        clean_content = glpi.clean_html_to_text(raw_content)[:100]
-        if len(raw_content) > 100:
-            clean_content += "..."
+                # Извлекаем данные тикета
+                title = html.escape(str(ticket.get("name", "Без названия"))[:45])
+                date_str = str(ticket.get("date_creation", "") or ticket.get("date", ""))[:10]
+                raw_content = ticket.get("content", "")
+                clean_content = glpi.clean_html_to_text(raw_content)[:100]
+                if len(raw_content) > 100:
+                    clean_content += "..."
+
+                # Имя инициатора (заявителя)
+                requester_name = ticket.get("_users_id_requester", "Неизвестно")
+                if not requester_name or requester_name == "Неизвестно":
+                    requester_name = "Не указан"
+
+                emoji, status_name = status_info.get(ticket_status, ("⚪", f"Статус {ticket_status}"))
+
+                # Формируем блок по шаблону
+                lines.append(f"🎫 <b>#{ticket_id}</b> — {title}")
+                lines.append(f"   📅 {date_str} | {emoji} {status_name}")
+                if clean_content:
+                    lines.append(f"   📄 <i>{clean_content}</i>")
+                lines.append(f"   👷 <b>Инициатор:</b> {html.escape(str(requester_name))}")
+                if is_mine:
+                    lines.append(f"   🔴 <b>Ожидает согласования:</b> ВАС!")
+                else:
+                    lines.append(f"   ⏳ <b>Ожидает согласования:</b> {html.escape(validator_name)}")
+                lines.append("")
+                shown_count += 1
 
-        requester_name = ticket.get("_users_id_requester", "Не указан")
-        emoji, status_name = status_info.get(ticket_status, ("⚪", f"Статус {ticket_status}"))
+        if page:
+            has_more = True
+            break
 
-        lines.append(f"🎫 <b>#{ticket_id}</b> — {title}")
-        lines.append(f"   📅 {date_str} | {emoji} {status_name}")
-        if clean_content:
-            lines.append(f"   📄 <i>{clean_content}</i>")
-        lines.append(f"   👷 <b>Инициатор:</b> {html.escape(str(requester_name))}")
-        if is_mine:
-            lines.append(f"   🔴 <b>Ожидает согласования:</b> ВАС!")
-        else:
-            lines.append(f"   ⏳ <b>Ожидает согласования:</b> {html.escape(validator_name)}")
-        lines.append("")
-        shown_count += 1
+    if pending_seen == 0:
+        if glpi.breaker.state != "closed":
+            return GLPI_UNAVAILABLE_TEXT, None
+        return "✅ Нет ожидающих согласований.", None
 
     if shown_count == 0:
-        await message.answer("✅ Нет активных согласований.")
-        return
+        return "✅ Нет активных согласований.", None
+
+    if has_more:
+        lines.append("<i>...есть и другие согласования, см. GLPI</i>")
 
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔄 Обновить", callback_data="check_validations")],
         [InlineKeyboardButton(text="🏠 Меню", callback_data="main_menu")]
     ])
+    return chr(10).join(lines), kb
 
-    msg = chr(10).join(lines)
-    await message.answer(msg, parse_mode="HTML", reply_markup=kb)
+@router.message(Command("approvals"))
+async def cmd_approvals(message: Message):
+    """Команда /approvals - показать все согласования"""
+    if message.from_user.id != Config.ADMIN_ID:
+        return
+
+    text, kb = await build_approvals_overview()
+    if kb is None:
+        await message.answer(text)
+        return
+    await message.answer(text, parse_mode="HTML", reply_markup=kb)
 
 @router.message(Command("my_tickets"))
 async def cmd_my_tickets(message: Message):
@@ -1120,9 +2404,12 @@ async def cmd_my_tickets(message: Message):
     if message.from_user.id != Config.ADMIN_ID:
         return
 
-    tickets = await glpi.get_active_tickets()
+    tickets = await glpi.get_active_tickets(detail_limit=10)
 
     if not tickets:
+        if glpi.breaker.state != "closed":
+            await message.answer(GLPI_UNAVAILABLE_TEXT)
+            return
         await message.answer("✅ Активных заявок нет.")
         return
 
@@ -1197,106 +2484,24 @@ async def cmd_help(message: Message):
 async def manual_check(call: CallbackQuery):
     """Режим супервизора: показать ВСЕ ожидающие согласования"""
     await call.answer("Проверяю согласования...")
-    
-    validations = await glpi.get_all_pending_validations()
-    
-    if not validations:
-        await call.message.answer("✅ Нет ожидающих согласований.")
-        return
-    
-    # Статусы для отображения
-    status_info = {
-        1: ("🟢", "Новый"),
-        2: ("🟡", "В работе"),
-        3: ("🔵", "Запланирован"),
-        4: ("🟣", "Ожидание"),
-        5: ("✅", "Решён"),
-    }
-    
-    lines = ["📋 <b>СТАТУС СОГЛАСОВАНИЙ</b>", ""]
-    shown_count = 0
-    
-    for val in validations:
-        if shown_count >= 10:
-            break
-        
-        ticket_id = val.get("ticket_id", "?")
-        validator_name = val.get("validator_name", "Неизвестно")
-        is_mine = val.get("is_mine", False)
-        
-        # Получаем полные данные тикета
-        ticket = await glpi.get_ticket_details(ticket_id)
-        
-        # Пропускаем если тикет не найден (404)
-        if not ticket:
-            continue
-        
-        # Пропускаем удалённые тикеты
-        if ticket.get("is_deleted") == 1:
-            continue
-        
-        # Пропускаем закрытые тикеты
-        ticket_status = ticket.get("status", 0)
-        try:
-            ticket_status = int(ticket_status)
-        except (ValueError, TypeError):
-            ticket_status = 0
-        
-        if ticket_status == 6:  # Closed
-            continue
-        
-        # Извлекаем данные тикета
-        title = html.escape(str(ticket.get("name", "Без названия"))[:45])
-        date_str = str(ticket.get("date_creation", "") or ticket.get("date", ""))[:10]
-        raw_content = ticket.get("content", "")
-        clean_content = glpi.clean_html_to_text(raw_content)[:100]
-        if len(raw_content) > 100:
-            clean_content += "..."
-        
-        # Имя инициатора (заявителя)
-        requester_name = ticket.get("_users_id_requester", "Неизвестно")
-        if not requester_name or requester_name == "Неизвестно":
-            requester_name = "Не указан"
-        
-        emoji, status_name = status_info.get(ticket_status, ("⚪", f"Статус {ticket_status}"))
-        
-        # Формируем блок по шаблону
-        lines.append(f"🎫 <b>#{ticket_id}</b> — {title}")
-        lines.append(f"   📅 {date_str} | {emoji} {status_name}")
-        if clean_content:
-            lines.append(f"   📄 <i>{clean_content}</i>")
-        lines.append(f"   👷 <b>Инициатор:</b> {html.escape(str(requester_name))}")
-        if is_mine:
-            lines.append(f"   🔴 <b>Ожидает согласования:</b> ВАС!")
-        else:
-            lines.append(f"   ⏳ <b>Ожидает согласования:</b> {html.escape(validator_name)}")
-        lines.append("")
-        shown_count += 1
-    
-    if shown_count == 0:
-        await call.message.answer("✅ Нет активных согласований.")
+
+    text, kb = await build_approvals_overview()
+    if kb is None:
+        await call.message.answer(text)
         return
-    
-    remaining = len(validations) - shown_count
-    if remaining > 0:
-        lines.append(f"<i>...и ещё {remaining} согласований</i>")
-    
-    kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔄 Обновить", callback_data="check_validations")],
-        [InlineKeyboardButton(text="🏠 Меню", callback_data="main_menu")]
-    ])
-    
-    msg = chr(10).join(lines)
-    await call.message.answer(msg, parse_mode="HTML", reply_markup=kb)
+    await call.message.answer(text, parse_mode="HTML", reply_markup=kb)
 
 @router.callback_query(F.data == "my_tickets")
 async def my_tickets_handler(call: CallbackQuery):
     """Показать список активных заявок пользователя"""
     await call.answer("Загружаю заявки...")
     
-    tickets = await glpi.get_active_tickets()
+    tickets = await glpi.get_active_tickets(detail_limit=10)
     
     if not tickets:
+        if glpi.breaker.state != "closed":
+            await call.message.answer(GLPI_UNAVAILABLE_TEXT)
+            return
         await call.message.answer("✅ Активных заявок нет.")
         return
     
@@ -1350,6 +2555,25 @@ async def my_tickets_handler(call: CallbackQuery):
     msg = chr(10).join(lines)
     await call.message.answer(msg, parse_mode="HTML", reply_markup=kb)
 
+@router.callback_query(F.data.startswith("digest_"))
+async def expand_digest_handler(call: CallbackQuery):
+    """Развернуть сводку массовых изменений в полные уведомления по заявкам"""
+    items = await load_digest(call.data.split("_", 1)[1])
+    if not items:
+        await call.answer("Сводка устарела", show_alert=True)
+        return
+    await call.answer("Загружаю подробности...")
+
+    rendered = await render_digest(items)
+    if rendered is None:
+        await call.message.answer(GLPI_UNAVAILABLE_TEXT)
+        return
+    if not rendered:
+        await call.message.answer("ℹ️ Заявки из сводки больше не найдены или уже вернулись в прежний статус.")
+        return
+    await enqueue_messages([outbox_message(msg, kb, chat_id=call.message.chat.id) for msg, kb in rendered])
+    outbox.wake()
+
 @router.callback_query(F.data == "create_ticket")
 async def start_create_ticket(call: CallbackQuery, state: FSMContext):
     await call.answer()
@@ -1557,30 +2781,41 @@ async def check_validations(silent=True):
     validations = await glpi.get_pending_validations()
     count = 0
     
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
+    # Новые отметки пишутся одной транзакцией с уведомлениями в finally:
+    # поставленное в очередь уведомление фиксируется, даже если цикл упадёт дальше
+    notified = []
+    messages = []
+    try:
+        candidates = []
         for val in validations:
             val_id = val.get('id')
             ticket_id = val.get('ticket_id')
-            raw_comment = val.get('comment_submission', '')
             
             if val_id is None or ticket_id is None:
                 logger.warning(f"⚠️ Skipping validation with missing data: {val}")
                 continue
             
-            # Проверка на дубликаты в памяти (глобальный set)
-            if val_id in glpi.notified_validations:
-                continue
+            candidates.append(val)
+        
+        # Проверка на дубликаты: память, затем БД — одним запросом
+        fresh = await glpi.dedup.filter_new("validation", [val['id'] for val in candidates])
+        new_validations = [val for val in candidates if val['id'] in fresh]
+        
+        # Детали тикетов для всех новых согласований — одним пакетом
+        tickets = await glpi.get_tickets_details([val['ticket_id'] for val in new_validations])
+        
+        for val in new_validations:
+            val_id = val['id']
+            ticket_id = val['ticket_id']
+            raw_comment = val.get('comment_submission', '')
             
-            # Проверка на дубликаты в БД (дополнительная защита)
-            cursor.execute("SELECT 1 FROM processed_validations WHERE glpi_id=?", (val_id,))
-            if cursor.fetchone():
-                # Добавляем в память, чтобы не проверять БД каждый раз
-                glpi.notified_validations.add(val_id)
+            # Детали тикета с расширенной информацией
+            ticket = tickets.get(glpi._parse_id(ticket_id))
+            if ticket and glpi._parse_id(ticket.get('status')) == 6:
+                # Тикет уже закрыт — согласовывать нечего; из pending_validations
+                # согласование уйдёт, когда закрытие попадёт в tickets
+                logger.info(f"⏭ Согласование #{val_id}: тикет #{ticket_id} закрыт, уведомление не отправляется")
                 continue
-            
-            # Получаем детали тикета с расширенной информацией
-            ticket = await glpi.get_ticket_details(ticket_id)
             if ticket:
                 title = ticket.get('name', 'Без названия')
                 
@@ -1588,7 +2823,7 @@ async def check_validations(silent=True):
                 raw_content = ticket.get('content', '')
                 clean_content = glpi.clean_html_to_text(raw_content)
                 
-                # Получаем имя заявителя (теперь это строка из get_ticket_details)
+                # Получаем имя заявителя (строка из get_tickets_details)
                 requester_name = ticket.get('_users_id_requester', 'Неизвестно')
                 if not requester_name or requester_name == 'Неизвестно':
                     # Fallback: пробуем users_id_recipient (получатель)
@@ -1634,349 +2869,853 @@ async def check_validations(silent=True):
                 ]
             ])
 
-            # Отправка уведомления директору
-            try:
-                await bot.send_message(Config.ADMIN_ID, msg, parse_mode="HTML", reply_markup=kb)
-                logger.info(f"✅ Уведомление о согласовании отправлено директору (ID: {Config.ADMIN_ID})")
-                await asyncio.sleep(0.5)  # Telegram flood control
-            except Exception as e:
-                logger.error(f"❌ Не удалось отправить уведомление директору: {e}")
+            # Уведомление директору — через outbox (доставляет outbox.run)
+            messages.append(outbox_message(msg, kb))
+            logger.info(f"📮 Уведомление о согласовании #{val_id} поставлено в очередь")
 
-            # Запоминаем в памяти и БД
-            glpi.notified_validations.add(val_id)
-            glpi.notified_ticket_ids.add(ticket_id)  # Для дедупликации с monitor
-            cursor.execute("INSERT INTO processed_validations (glpi_id) VALUES (?)", (val_id,))
-            conn.commit()
+            # Запоминаем в памяти и БД (тикет — для дедупликации с check_tickets)
+            ticket_key = glpi._parse_id(ticket_id)
+            notified.append(glpi.dedup.mark("validation", val_id, ticket_key))
+            notified.append(glpi.dedup.mark("ticket", ticket_key, ticket_key))
             count += 1
+    finally:
+        await save_notified(notified, messages)
+        if messages:
+            outbox.wake()
             
     return count
 
-async def check_tickets():
-    """Проверка изменений в активных тикетах"""
+TICKET_WATERMARK_OVERLAP = timedelta(seconds=60)
+
+async def _ticket_poll_window():
+    """Режим опроса тикетов: (modified_since, is_full).
+
+    Обычный цикл — инкрементальный: только тикеты с date_mod позже сохранённого
+    watermark (минус TICKET_WATERMARK_OVERLAP на случай записей в ту же секунду;
+    повторно полученные тикеты безвредны — статус сверяется с БД). Раз в
+    GLPI_FULL_SYNC_INTERVAL (и при первом запуске) — полная сверка всех активных.
+    """
+    watermark = await get_state("tickets_date_mod")
+    last_full = float(await get_state("tickets_full_sync_at", "0"))
+    if not watermark or time.time() - last_full >= Config.FULL_SYNC_INTERVAL:
+        return None, True
     try:
-        tickets = await glpi.get_all_active_tickets()
-        if not tickets:
+        since = datetime.strptime(watermark, "%Y-%m-%d %H:%M:%S") - TICKET_WATERMARK_OVERLAP
+    except ValueError:
+        return None, True
+    return since.strftime("%Y-%m-%d %H:%M:%S"), False
+
+# Поля, по которым считается отпечаток тикета (все — из тонкой проекции поиска)
+TICKET_SNAPSHOT_FIELDS = ("status", "priority", "technician", "validation", "date_mod")
+# Изменение каких из них стоит уведомления (date_mod меняет любая правка/комментарий)
+TICKET_NOTIFY_FIELDS = ("status", "priority", "technician", "validation")
+
+PRIORITY_NAMES = {
+    1: "Очень низкий", 2: "Низкий", 3: "Средний",
+    4: "Высокий", 5: "Очень высокий", 6: "Критический"
+}
+VALIDATION_NAMES = {1: "Не требуется", 2: "Ожидает", 3: "Согласовано", 4: "Отказано"}
+
+def ticket_snapshot(ticket):
+    """Сравниваемые поля тикета из строки тонкой проекции"""
+    tech = ticket.get("technician_name")
+    if not isinstance(tech, list):
+        tech = str(tech or "").split("$#$")
+    tech_ids = sorted({str(t).strip() for t in tech if str(t).strip() not in ("", "0", "None")})
+    return {
+        "status": ticket.get("status"),
+        "priority": ticket.get("priority"),
+        "technician": ",".join(tech_ids),
+        "validation": ticket.get("global_validation"),
+        "date_mod": ticket.get("date_mod") or "",
+    }
+
+def ticket_fingerprint(snapshot):
+    """Компактный отпечаток снимка: совпал — тикет не менялся, ничего не дочитываем"""
+    raw = "|".join(str(snapshot[field]) for field in TICKET_SNAPSHOT_FIELDS)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+def ticket_row(ticket, title):
+    """Строка для save_ticket_changes() из тикета с посчитанным снимком"""
+    snapshot = ticket['_snapshot']
+    return (
+        glpi._parse_id(ticket.get('id')), snapshot['status'], title, snapshot['priority'],
+        snapshot['technician'], snapshot['validation'], snapshot['date_mod'], ticket['_fingerprint'],
+    )
+
+# Активность для расписания проверок: тикет, изменённый за последний час, —
+# «горячий», за последние сутки — «тёплый», раньше — «холодный»
+TICKET_HOT_WINDOW = 3600
+TICKET_WARM_WINDOW = 86400
+
+class TicketScheduler:
+    """Расписание плановых проверок тикетов: heap по времени следующей проверки.
+
+    Интервал зависит от тикета: высокий приоритет, ожидание согласования или
+    изменение за последний час — TICKET_CADENCE_HOT, изменение за сутки —
+    TICKET_CADENCE_WARM, остальные — TICKET_CADENCE_COLD. Любое свежее чтение
+    тикета (плановое или общим опросом) переносит его следующую проверку.
+    Плановые проверки расходуют бюджет SCHEDULER_BUDGET запросов в минуту
+    (один запрос — до GLPI_BATCH_SIZE тикетов): при нехватке токенов
+    просроченные тикеты ждут, самые давние — первыми. Закрытые тикеты и
+    тикеты, пропавшие из GLPI, из расписания убираются. budget <= 0 — плановые
+    проверки выключены (TokenBucket с нулевой скоростью значил бы «без лимита»):
+    остаются только общие опросы раз в GLPI_CHECK_INTERVAL.
+    """
+
+    def __init__(self, budget):
+        self.enabled = budget > 0
+        self.bucket = TokenBucket(budget / 60, budget)
+        self._heap = []         # (due, ticket_id); устаревшие записи пропускаются при извлечении
+        self._due = {}          # ticket_id → актуальное время следующей проверки
+        self._state = {}        # ticket_id → последний снимок (status/priority/validation/date_mod)
+        self._last_change = {}  # ticket_id → когда тикет последний раз менялся (epoch)
+
+    def __len__(self):
+        return len(self._due)
+
+    @staticmethod
+    def _date_mod_epoch(date_mod):
+        try:
+            return datetime.strptime(date_mod or "", "%Y-%m-%d %H:%M:%S").timestamp()
+        except ValueError:
+            return 0
+
+    def cadence(self, ticket_id, now):
+        state = self._state[ticket_id]
+        idle = now - self._last_change.get(ticket_id, 0)
+        if (state.get('priority') or 0) >= 4 or state.get('validation') == 2 or idle < TICKET_HOT_WINDOW:
+            return Config.TICKET_CADENCE_HOT
+        if idle < TICKET_WARM_WINDOW:
+            return Config.TICKET_CADENCE_WARM
+        return Config.TICKET_CADENCE_COLD
+
+    def _schedule(self, ticket_id, due):
+        self._due[ticket_id] = due
+        heapq.heappush(self._heap, (due, ticket_id))
+        if len(self._heap) > 4 * len(self._due) + 64:
+            self._heap = [(d, tid) for tid, d in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def observe(self, ticket_id, state, changed=False):
+        """Учесть свежий снимок тикета (ticket_snapshot() или строку load_ticket_states())"""
+        if not ticket_id or not self.enabled:
+            return
+        if state.get('status') == 6:
+            self.discard(ticket_id)
+            return
+        now = time.time()
+        if changed:
+            self._last_change[ticket_id] = now
+        elif ticket_id not in self._last_change:
+            # Впервые видим тикет без изменений — судим по date_mod из GLPI
+            self._last_change[ticket_id] = self._date_mod_epoch(state.get('date_mod'))
+        self._state[ticket_id] = state
+        self._schedule(ticket_id, now + self.cadence(ticket_id, now))
+
+    def discard(self, ticket_id):
+        for d in (self._due, self._state, self._last_change):
+            d.pop(ticket_id, None)
+
+    def pop_due(self):
+        """ID тикетов, которым пора на проверку, — в пределах бюджета запросов.
+
+        Извлечённые тикеты сразу переносятся на следующий интервал: если проверка
+        не удастся, они не потеряются; удачная проверка перенесёт их через observe().
+        """
+        now = time.time()
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            if len(due) % Config.GLPI_BATCH_SIZE == 0 and self.bucket.take():
+                break
+            _, ticket_id = heapq.heappop(self._heap)
+            due.append(ticket_id)
+            self._schedule(ticket_id, now + self.cadence(ticket_id, now))
+        return due
+
+    def next_delay(self):
+        """Через сколько секунд появится плановая работа (None — расписание пусто)"""
+        self._drop_stale()
+        if not self._heap:
+            return None
+        wait = self._heap[0][0] - time.time()
+        return wait if wait > 0 else self.bucket.delay()
+
+ticket_scheduler = TicketScheduler(Config.SCHEDULER_BUDGET)
+
+async def describe_ticket_changes(stored, snapshot, fields):
+    """Строки «было → стало» для изменившихся полей (кроме статуса)"""
+    lines = []
+    if "priority" in fields:
+        old = PRIORITY_NAMES.get(stored["priority"], "Неизвестно")
+        new = PRIORITY_NAMES.get(snapshot["priority"], "Неизвестно")
+        lines.append(f"⚡ <b>Приоритет:</b> {old} → {new}")
+    if "technician" in fields:
+        old_ids = [int(i) for i in (stored["technician"] or "").split(",") if i.isdigit()]
+        new_ids = [int(i) for i in snapshot["technician"].split(",") if i.isdigit()]
+        names = await glpi._get_names("user", old_ids + new_ids)
+        old = ", ".join(names.get(i, f"User #{i}") for i in old_ids) or "никто"
+        new = ", ".join(names.get(i, f"User #{i}") for i in new_ids) or "никто"
+        lines.append(f"🔧 <b>Назначена:</b> {html.escape(old)} → {html.escape(new)}")
+    if "validation" in fields:
+        old = VALIDATION_NAMES.get(stored["validation"], "—")
+        new = VALIDATION_NAMES.get(snapshot["validation"], "—")
+        lines.append(f"⏳ <b>Согласование:</b> {old} → {new}")
+    return lines
+
+class TicketContext:
+    """Под-ресурсы одного тикета в пределах одного цикла мониторинга.
+
+    Каждый под-ресурс (Ticket_User, ITILFollowup, ITILSolution, TicketValidation,
+    TicketTask) запрашивается лениво и не более одного раза: повторные и
+    одновременные обращения получают тот же результат. Производные значения
+    (последнее решение/комментарий, техник) вычисляются из уже полученных списков.
+    """
+
+    def __init__(self, client, ticket):
+        self.client = client
+        self.ticket = ticket
+        self.ticket_id = ticket.get('id')
+        self._memo = {}
+
+    def _once(self, resource, fetch):
+        task = self._memo.get(resource)
+        if task is None:
+            task = self._memo[resource] = asyncio.ensure_future(fetch(self.ticket_id))
+        return task
+
+    async def ticket_users(self):
+        return await self._once("Ticket_User", self.client.get_ticket_users)
+
+    async def followups(self):
+        return await self._once("ITILFollowup", self.client.get_ticket_followups)
+
+    async def solutions(self):
+        return await self._once("ITILSolution", self.client.get_ticket_solutions)
+
+    async def validations(self):
+        return await self._once("TicketValidation", self.client.get_ticket_validations)
+
+    async def tasks(self):
+        return await self._once("TicketTask", self.client.get_ticket_tasks)
+
+    async def technician(self):
+        return await self.client.get_ticket_technician(self.ticket_id, await self.ticket_users())
+
+    async def last_followup(self):
+        followups = await self.followups()
+        return max(followups, key=lambda fu: fu.get('id') or 0) if followups else None
+
+    async def last_solution(self):
+        solutions = await self.solutions()
+        return max(solutions, key=lambda sol: sol.get('id') or 0) if solutions else None
+
+async def enrich_status_change(ctx):
+    """Контекст уведомления о смене статуса: все под-ресурсы тикета — параллельно.
+
+    Раньше каждый запрос (техник, согласования, комментарии, решения, задачи и
+    имена по ним) ждал предыдущего — десяток последовательных round-trip'ов на
+    тикет. Теперь независимые запросы идут одним gather через TicketContext
+    (каждый ресурс — ровно один раз), а имена согласующих и исполнителей задач —
+    одним пакетом вторым шагом: глубина — два round-trip'а.
+    """
+    updater_id = glpi._parse_id(ctx.ticket.get('users_id_lastupdater'))
+
+    async def _updater_name():
+        return await glpi._get_user_name(updater_id) if updater_id else None
+
+    (updater_name, assignee, validations, followups, solutions,
+     last_solution, last_followup, tasks) = await asyncio.gather(
+        _updater_name(),
+        ctx.technician(),
+        ctx.validations(),
+        ctx.followups(),
+        ctx.solutions(),
+        ctx.last_solution(),
+        ctx.last_followup(),
+        ctx.tasks(),
+    )
+
+    pending = [v for v in validations if int(v.get('status', 0)) in (1, 2)]
+    validator_ids = list(dict.fromkeys(
+        int(v['users_id_validate']) for v in pending if v.get('users_id_validate')))[:2]
+    tech_ids = [int(t['users_id_tech']) for t in tasks if t.get('users_id_tech')]
+    names = await glpi._get_names("user", validator_ids + tech_ids) if validator_ids or tech_ids else {}
+
+    return {
+        'updater_name': updater_name,
+        'assignee': assignee,
+        'validator_names': [names[uid] for uid in validator_ids if names.get(uid)],
+        'followups': followups,
+        'solutions': solutions,
+        'last_solution': last_solution,
+        'last_followup': last_followup,
+        'tasks': tasks,
+        'task_tech_names': {uid: names.get(uid) for uid in tech_ids},
+    }
+
+async def enrich_status_changes(changed):
+    """Контекст смен статуса по всем тикетам сразу, до рендеринга → {ticket_id: ctx}.
+
+    changed — [(ticket, stored, fields)]; уведомления не ждут друг друга по
+    цепочке запросов.
+    """
+    status_changed = [ticket for ticket, stored, fields in changed
+                      if stored and "status" in fields and stored['status'] != ticket.get('status')]
+    if not status_changed:
+        return {}
+    contexts = [TicketContext(glpi, ticket) for ticket in status_changed]
+    # Считаем запросы там, где они уходят в GLPI (_send), а не промахи мемо:
+    # обход TicketContext тоже попадёт в журнал
+    request_log = Counter()
+    token = GLPI_REQUEST_LOG.set(request_log)
+    try:
+        results = await glpi._gather_bounded(enrich_status_change, contexts)
+    finally:
+        GLPI_REQUEST_LOG.reset(token)
+    subresources = {endpoint: n for (method, endpoint, _), n in request_log.items()
+                    if method == "GET" and re.fullmatch(r"/Ticket/\d+/\w+", endpoint)}
+    fetches = Counter()
+    for endpoint, n in subresources.items():
+        fetches[endpoint.rsplit('/', 1)[1]] += n
+    repeated = {endpoint: n for (method, endpoint, _), n in request_log.items()
+                if n > 1 and endpoint in subresources}
+    logger.debug(f"🧮 TicketContext: {len(contexts)} тикетов, запросы под-ресурсов {dict(fetches)}, повторных: {len(repeated)}")
+    if repeated:
+        logger.warning(f"⚠️ Под-ресурсы тикетов запрошены повторно за цикл: {repeated}")
+    return {ctx.ticket_id: result for ctx, result in zip(contexts, results)}
+
+async def render_ticket_change(ticket, stored, fields, ctx=None):
+    """Полное уведомление по тикету → (msg, kb | None); None — уведомлять не о чем.
+
+    stored — сохранённый снимок (None — новый тикет), fields — изменившиеся
+    поля, ctx — результат enrich_status_change() для смены статуса.
+    """
+    db_status = stored['status'] if stored else None
+    glpi_id = ticket.get('id')
+    api_status = ticket.get('status')
+    title = ticket.get('title', 'Без названия')
+    location_name = ticket.get('location_name') or 'Не указано'
+    requester_name = ticket.get('requester_name') or 'Неизвестно'
+    technician_name = ticket.get('technician_name') or ''
+    raw_content = ticket.get('content', '')
+    priority = ticket.get('priority', 3)
+    date_creation = ticket.get('date_creation') or ticket.get('date', '')
+    users_id_lastupdater = ticket.get('users_id_lastupdater', 0)
+
+    # Очищаем контент (500 символов для полного отображения описания)
+    _full_content = glpi.clean_html_to_text(raw_content)
+    clean_content = _full_content[:500]
+    if len(_full_content) > 500:
+        clean_content += '...'
+
+    # Emoji для статусов
+    status_emoji = {
+        1: "🟢",  # New
+        2: "🟡",  # Processing
+        3: "🔵",  # Planned
+        4: "🟣",  # Pending
+        5: "✅",  # Solved
+    }
+    emoji = status_emoji.get(api_status, "⚪")
+
+    # Экранируем данные
+    safe_title = html.escape(str(title))
+    safe_location = html.escape(str(location_name))
+    safe_requester = html.escape(str(requester_name))
+    safe_technician = html.escape(str(technician_name)) if technician_name else ""
+
+    priority_names = PRIORITY_NAMES
+
+    if db_status is None:
+        # Новый тикет (без согласования)
+        priority_name = priority_names.get(priority, f"Уровень {priority}")
+        date_str = str(date_creation)[:16]
+
+        assignee_line = f"\n👷 <b>Кому:</b> {safe_technician}" if safe_technician else ""
+        desc_block = f"\n📝 <b>Описание:</b>\n<i>{clean_content}</i>" if clean_content else ""
+
+        msg = (
+            f"🆕 <b>НОВАЯ ЗАЯВКА #{glpi_id}</b>\n\n"
+            f"📋 {safe_title}\n\n"
+            f"👤 <b>От кого:</b> {safe_requester}{assignee_line}"
+            f"{desc_block}\n\n"
+            f"📍 <b>Местоположение:</b> {safe_location}\n\n"
+            f"📅 <b>Создано:</b> {date_str}\n"
+            f"⚡ <b>Приоритет:</b> {priority_name}\n"
+            f"📊 <b>Статус:</b> {get_status_name(api_status)}"
+        )
+
+        kb = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(
+                text="🔗 Открыть в GLPI",
+                url=f"{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}"
+            )]
+        ])
+        return msg, kb
+
+    elif "status" not in fields:
+        # Статус прежний, но изменились приоритет / назначение / согласование
+        change_lines = await describe_ticket_changes(stored, ticket['_snapshot'], fields)
+        msg = (
+            f"✏️ <b>Заявка #{glpi_id} изменена</b>\n\n"
+            f"📋 {safe_title}\n\n"
+            + "\n".join(change_lines) +
+            f"\n\n📊 <b>Статус:</b> {get_status_name(api_status)}\n"
+            f"📍 <b>Местоположение:</b> {safe_location}\n\n"
+            f"🔗 <a href='{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}'>Открыть в GLPI</a>"
+        )
+        return msg, None
+
+    else:
+        if db_status != api_status:
+            # Изменение статуса — полный контекст
+            old_name = get_status_name(db_status)
+            new_name = get_status_name(api_status)
+
+            # Всё, что нужно для уведомления, уже получено параллельно
+            ctx = ctx or {}
+
+            # Кто изменил
+            last_updater_name = ctx.get('updater_name') or "Неизвестно"
+            safe_updater = html.escape(str(last_updater_name))
+
+            # Emoji для нового статуса
+            status_emoji_map = {1: "🆕", 2: "🔧", 3: "📅", 4: "⏸️", 5: "✅", 6: "🔒"}
+            status_hdr_emoji = status_emoji_map.get(api_status, "🔄")
+
+            # Назначение (всегда)
+            assignee = ctx.get('assignee')
+            assignee_line = f"\n🔧 <b>Назначена:</b> {html.escape(assignee)}" if assignee else ""
+
+            # Pending согласования
+            validation_line = ""
+            try:
+                names = ctx.get('validator_names') or []
+                if names:
+                    escaped = [html.escape(n) for n in names]
+                    validation_line = f"\n⏳ <b>На согласовании у:</b> {', '.join(escaped)}"
+            except Exception:
+                pass
+
+            # Решение / комментарий к смене статуса
+            solution_block = ""
+
+            # Ищем followup/решение, добавленные вместе со сменой статуса (±2 мин от date_mod)
+            # Окно нужно, т.к. между опросами могло произойти НЕСКОЛЬКО смен статуса подряд
+            # (например 2→5 с решением, затем сразу 5→3 при отклонении решения) — бот видит
+            # только итоговый переход, поэтому решение может лежать в ITILSolution, а не в
+            # ITILFollowup, даже если итоговый статус не 5/6.
+            date_mod = ticket.get('date_mod', '')
+            mod_time = None
+            window = timedelta(minutes=2)
+            if date_mod:
+                try:
+                    mod_time = datetime.strptime(date_mod, "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    mod_time = None
+
+            all_followups = ctx.get('followups') or []
+            recent_followups = []
+            if mod_time:
+                for fu in all_followups:
+                    fu_date = fu.get('date_creation', '')
+                    if fu_date:
+                        try:
+                            fu_time = datetime.strptime(fu_date, "%Y-%m-%d %H:%M:%S")
+                            if abs((fu_time - mod_time).total_seconds()) <= window.total_seconds():
+                                recent_followups.append(fu)
+                        except ValueError:
+                            pass
+
+            all_solutions = ctx.get('solutions') or []
+            recent_solutions = []
+            if mod_time:
+                for sol in all_solutions:
+                    sol_date = sol.get('date_creation', '')
+                    if sol_date:
+                        try:
+                            sol_time = datetime.strptime(sol_date, "%Y-%m-%d %H:%M:%S")
+                            if abs((sol_time - mod_time).total_seconds()) <= window.total_seconds():
+                                recent_solutions.append(sol)
+                        except ValueError:
+                            pass
+
+            if api_status in [5, 6]:
+                sol_data = ctx.get('last_solution')
+                if sol_data and sol_data["content"]:
+                    sol_user = html.escape(sol_data["user_name"])
+                    solution_block = f"\n\n💡 <b>Решение ({sol_user}):</b>\n<i>{sol_data['content'][:500]}</i>"
+                elif recent_followups:
+                    # Показываем ВСЕ комментарии, добавленные вместе со сменой статуса
+                    fu_lines = []
+                    for fu in recent_followups:
+                        if fu.get('content'):
+                            fu_user = html.escape(fu['user_name'])
+                            fu_lines.append(f"• <i>{fu['content'][:500]}</i> ({fu_user})")
+                    if fu_lines:
+                        label = "Комментарий" if len(fu_lines) == 1 else "Комментарии"
+                        solution_block = f"\n\n💬 <b>{label}:</b>\n" + "\n".join(fu_lines)
+                else:
+                    fu_data = ctx.get('last_followup')
+                    if fu_data and fu_data["content"]:
+                        fu_user = html.escape(fu_data["user_name"])
+                        solution_block = f"\n\n💬 <b>Комментарий ({fu_user}):</b>\n<i>{fu_data['content'][:500]}</i>"
+            else:
+                if recent_solutions:
+                    last_sol = max(recent_solutions, key=lambda x: x.get('date_creation', ''))
+                    if last_sol.get('content'):
+                        sol_user = html.escape(last_sol['user_name'])
+                        solution_block = f"\n\n💡 <b>Решение ({sol_user}):</b>\n<i>{last_sol['content'][:500]}</i>"
+                elif recent_followups:
+                    # Показываем ВСЕ комментарии, добавленные вместе со сменой статуса
+                    fu_lines = []
+                    for fu in recent_followups:
+                        if fu.get('content'):
+                            fu_user = html.escape(fu['user_name'])
+                            fu_lines.append(f"• <i>{fu['content'][:500]}</i> ({fu_user})")
+                    if fu_lines:
+                        label = "Комментарий" if len(fu_lines) == 1 else "Комментарии"
+                        solution_block = f"\n\n💬 <b>{label}:</b>\n" + "\n".join(fu_lines)
+                else:
+                    fu_data = ctx.get('last_followup')
+                    if fu_data and fu_data["content"]:
+                        fu_user = html.escape(fu_data["user_name"])
+                        solution_block = f"\n\n💬 <b>Комментарий ({fu_user}):</b>\n<i>{fu_data['content'][:500]}</i>"
+
+            # Задачи (ITILTask)
+            # GLPI Planning class constants (inc/planning.class.php): только 3 значения, не 5!
+            TASK_STATUS = {0: 'ℹ️', 1: '⬜', 2: '✅'}
+            tasks_block = ""
+            try:
+                tasks = ctx.get('tasks') or []
+                if tasks:
+                    task_lines = []
+                    for t in tasks:
+                        t_status = int(t.get('state', 0))
+                        t_emoji = TASK_STATUS.get(t_status, '❓')
+                        t_text = glpi.clean_html_to_text(t.get('content', ''))
+                        if len(t_text) > 100:
+                            t_text = t_text[:100] + '...'
+                        t_tech = ""
+                        t_tech_id = t.get('users_id_tech')
+                        if t_tech_id:
+                            tech_name = ctx.get('task_tech_names', {}).get(int(t_tech_id))
+                            if tech_name:
+                                t_tech = f" → {html.escape(tech_name)}"
+                        t_time = ""
+                        actiontime = t.get('actiontime', 0)
+                        if actiontime and int(actiontime) > 0:
+                            total_sec = int(actiontime)
+                            hours, remainder = divmod(total_sec, 3600)
+                            minutes, _ = divmod(remainder, 60)
+                            t_time = f" ⏱ {hours}ч {minutes}м"
+                        t_dates = ""
+                        ds = t.get('date_start', '')
+                        de = t.get('date_end', '')
+                        if ds and de:
+                            t_dates = f" ({ds[-8:-3]} → {de[-8:-3]})"
+                        elif ds:
+                            t_dates = f" (с {ds[-8:-3]})"
+                        task_lines.append(f"  {t_emoji} {html.escape(t_text)}{t_tech}{t_time}{t_dates}")
+                    if task_lines:
+                        tasks_block = "\n\n📂 <b>Задачи:</b>\n" + "\n".join(task_lines)
+            except Exception:
+                pass
+
+            # "Других изменений нет"
+            changes_line = ""
+            if not solution_block and not assignee_line and not validation_line and not tasks_block:
+                changes_line = "\n\n🔖 Других изменений в заявке не производилось"
+
+            # Что ещё изменилось вместе со статусом (по отпечатку)
+            other_fields = [f for f in fields if f != "status"]
+            if other_fields:
+                change_lines = await describe_ticket_changes(stored, ticket['_snapshot'], other_fields)
+                changes_line = "\n\n🔄 <b>Также изменено:</b>\n" + "\n".join(change_lines) + changes_line
+
+            msg = (
+                f"{status_hdr_emoji} <b>Статус заявки #{glpi_id} изменён</b>\n\n"
+                f"📋 {safe_title}\n\n"
+                f"👤 <b>От кого:</b> {safe_requester}\n"
+                f"📝 <b>Описание:</b>\n<i>{clean_content}</i>\n\n"
+                f"📍 <b>Местоположение:</b> {safe_location}\n\n"
+                f"📅 <b>Создано:</b> {date_creation[:16] if date_creation else 'N/A'}\n"
+                f"⚡ <b>Приоритет:</b> {priority_names.get(priority, 'Неизвестно')}\n"
+                f"📊 <b>Статус:</b> {old_name} → {new_name}"
+                f"\n👤 <b>Кто изменил:</b> {safe_updater}"
+                f"{assignee_line}"
+                f"{validation_line}"
+                f"{solution_block}"
+                f"{tasks_block}"
+                f"{changes_line}\n\n"
+                f"🔗 <a href='{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}'>Открыть в GLPI</a>"
+            )
+
+            kb = InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(
+                    text="🔗 Открыть в GLPI",
+                    url=f"{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}"
+                )]
+            ])
+            return msg, kb
+    return None
+
+# Сводка: лимит длины одного сообщения (у Telegram — 4096 символов с разметкой)
+DIGEST_MAX_LEN = 3500
+TICKET_FIELD_LABELS = {"priority": "приоритет", "technician": "назначение", "validation": "согласование"}
+
+def build_digests(changed):
+    """Сводки по массовому изменению → [(msg, kb, digest_key, items)].
+
+    Тикеты группируются по новому статусу (новые и изменённые без смены
+    статуса — отдельными группами), у каждого — ссылка в GLPI. Длинная
+    сводка делится на несколько сообщений; у каждого своя кнопка «Подробно»,
+    разворачивающая его тикеты в полные уведомления (items — то, что для
+    этого нужно: ID, прежний снимок, изменившиеся поля).
+    """
+    groups = {}
+    for ticket, stored, fields in changed:
+        if stored is None:
+            key, label = "new", "🆕 Новые"
+        elif "status" in fields:
+            key, label = ticket.get('status'), f"📊 → {get_status_name(ticket.get('status'))}"
+        else:
+            key, label = "changed", "✏️ Изменены"
+        groups.setdefault(key, (label, []))[1].append((ticket, stored, fields))
+
+    pages, lines, items, size = [], [], [], 0
+    for label, group in groups.values():
+        header = f"\n<b>{label}</b> ({len(group)}):"
+        first = True
+        for ticket, stored, fields in group:
+            glpi_id = ticket.get('id')
+            title = html.escape(str(ticket.get('title', 'Без названия'))[:60])
+            if stored is None:
+                detail = ""
+            elif "status" in fields:
+                detail = f" (было: {get_status_name(stored['status'])})"
+            else:
+                detail = f" ({', '.join(TICKET_FIELD_LABELS.get(f, f) for f in fields)})"
+            line = f"• <a href='{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}'>#{glpi_id}</a> {title}{detail}"
+            if first:
+                line = f"{header}\n{line}"
+            if lines and size + len(line) > DIGEST_MAX_LEN:
+                pages.append((lines, items))
+                lines, items, size = [], [], 0
+                if not first:
+                    line = f"{header}\n{line}"  # заголовок группы — и на новой странице
+            first = False
+            lines.append(line)
+            size += len(line) + 1
+            items.append({'id': glpi._parse_id(glpi_id), 'stored': stored, 'fields': fields})
+    if lines:
+        pages.append((lines, items))
+
+    result = []
+    for n, (lines, items) in enumerate(pages, 1):
+        part = f" ({n}/{len(pages)})" if len(pages) > 1 else ""
+        msg = f"📦 <b>Сводка изменений заявок: {len(changed)}</b>{part}\n" + "\n".join(lines)
+        key = os.urandom(4).hex()
+        kb = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text=f"📖 Подробно ({len(items)})", callback_data=f"digest_{key}")]
+        ])
+        result.append((msg, kb, key, items))
+    return result
+
+async def render_digest(items):
+    """Развернуть элементы сводки в полные уведомления → [(msg, kb)]; None — GLPI недоступен.
+
+    Тикеты перечитываются из GLPI (тонко + hydrate + контекст смены статуса),
+    «было» — снимок на момент сводки.
+    """
+    tickets = await glpi.get_tickets_by_ids([item['id'] for item in items])
+    if tickets is None:
+        return None
+    by_id = {glpi._parse_id(t.get('id')): t for t in tickets}
+    changed = []
+    for item in items:
+        ticket = by_id.get(item['id'])
+        if ticket is None:
+            continue
+        ticket['_snapshot'] = ticket_snapshot(ticket)
+        changed.append((ticket, item['stored'], item['fields']))
+    await glpi.hydrate_tickets([ticket for ticket, _, _ in changed])
+    enrichments = await enrich_status_changes(changed)
+    rendered = []
+    for ticket, stored, fields in changed:
+        result = await render_ticket_change(ticket, stored, fields, enrichments.get(ticket.get('id')))
+        if result:
+            rendered.append(result)
+    return rendered
+
+async def reconcile_vanished(tickets, known):
+    """Тикеты, выпавшие из активных со времени прошлой сверки → их свежие строки.
+
+    get_all_active_tickets() видит только статусы 1–5: закрытие между опросами
+    не попадало в check_tickets, и строка в tickets навсегда оставалась в
+    старом статусе. На полной сверке: (не закрытые в БД) − (активные в GLPI),
+    и только эти ID — пакетным поиском. Найденные идут обычным конвейером
+    (смена статуса → «Закрыта»); пропавшие из GLPI совсем (удалены, в корзине,
+    нет прав) тихо помечаются закрытыми.
+    """
+    active = {glpi._parse_id(t.get('id')) for t in tickets}
+    vanished = [tid for tid, state in known.items() if state['status'] != 6 and tid not in active]
+    if not vanished:
+        return []
+    found = await glpi.get_tickets_by_ids(vanished)
+    if found is None:
+        return []
+    logger.info(f"🔎 Сверка закрытий: {len(vanished)} тикетов выпали из активных, найдено в GLPI: {len(found)}")
+    missing = set(vanished) - {glpi._parse_id(t.get('id')) for t in found}
+    if missing:
+        await mark_tickets_closed(missing)
+        await glpi.dedup.expire_tickets(missing)
+        for ticket_id in missing:
+            ticket_scheduler.discard(ticket_id)
+        logger.info(f"🗑 Тикеты {sorted(missing)} больше не найдены в GLPI — помечены закрытыми")
+    return found
+
+async def check_tickets(ticket_ids=None):
+    """Проверка изменений в активных тикетах.
+
+    Двухфазно: опрос — по тонкой проекции (id, status, date_mod, priority,
+    техник, согласование). Для каждого тикета хранится отпечаток этих полей:
+    совпал — тикет пропускается без единого запроса. Content/Title/локация/имена
+    дочитываются одним пакетом только для новых тикетов и тикетов, у которых
+    изменился статус, приоритет, назначение или согласование. Изменение одного
+    date_mod (комментарий, правка текста) лишь обновляет отпечаток.
+
+    ticket_ids — плановая проверка тикетов из ticket_scheduler: поиск только по
+    этим ID (в т.ч. уже закрытым), watermark общего опроса не двигается.
+    """
+    try:
+        if ticket_ids is None:
+            modified_since, is_full = await _ticket_poll_window()
+            tickets = await glpi.get_all_active_tickets(modified_since=modified_since, slim=True)
+            if tickets is None:
+                # Опрос не удался: watermark, время полной сверки и сверка
+                # закрытий остаются до следующего цикла
+                return 0
+        else:
+            tickets = await glpi.get_tickets_by_ids(ticket_ids)
+            if tickets is None:
+                return 0
+            found = {glpi._parse_id(t.get('id')) for t in tickets}
+            for ticket_id in ticket_ids:
+                if ticket_id not in found:
+                    ticket_scheduler.discard(ticket_id)
+        full_sync = ticket_ids is None and is_full
+        if not tickets and not full_sync:
             return 0
+        # Пустой результат полной сверки — не повод выходить: так бывает, когда
+        # закрыты последние активные тикеты, и их закрытие находит reconcile_vanished
         
         new_count = 0
-        with sqlite3.connect(DATABASE_PATH) as conn:
-            cursor = conn.cursor()
-            
+        # Состояние из БД — одним запросом; изменения копятся в памяти и пишутся
+        # одной транзакцией в finally. Уведомление и строка его тикета добавляются
+        # вместе: поставленное в очередь фиксируется, даже если обработка
+        # следующего тикета упадёт, а тикет без уведомления не помечается виденным
+        known = await load_ticket_states(
+            None if ticket_ids is None else [glpi._parse_id(t.get('id')) for t in tickets])
+        if full_sync:
+            tickets = tickets + await reconcile_vanished(tickets, known)
+        writes = []
+        messages = []
+        digests = []
+        try:
+            # Фаза 1: сравнение отпечатков — какие тикеты дадут уведомление
+            changed = []
             for ticket in tickets:
                 glpi_id = ticket.get('id')
                 api_status = ticket.get('status')
-                title = ticket.get('title', 'Без названия')
-                location_name = ticket.get('location_name') or 'Не указано'
-                requester_name = ticket.get('requester_name') or 'Неизвестно'
-                technician_name = ticket.get('technician_name') or ''
-                raw_content = ticket.get('content', '')
-                priority = ticket.get('priority', 3)
-                date_creation = ticket.get('date_creation') or ticket.get('date', '')
-                users_id_lastupdater = ticket.get('users_id_lastupdater', 0)
-
-                # Очищаем контент (500 символов для полного отображения описания)
-                _full_content = glpi.clean_html_to_text(raw_content)
-                clean_content = _full_content[:500]
-                if len(_full_content) > 500:
-                    clean_content += '...'
-                
                 if not glpi_id or not api_status:
                     continue
                 
-                # Проверяем, есть ли тикет в БД
-                cursor.execute(
-                    "SELECT status FROM tickets WHERE glpi_id = ?",
-                    (glpi_id,)
-                )
-                row = cursor.fetchone()
+                snapshot = ticket_snapshot(ticket)
+                fingerprint = ticket_fingerprint(snapshot)
+                ticket['_snapshot'], ticket['_fingerprint'] = snapshot, fingerprint
                 
-                # Emoji для статусов
-                status_emoji = {
-                    1: "🟢",  # New
-                    2: "🟡",  # Processing
-                    3: "🔵",  # Planned
-                    4: "🟣",  # Pending
-                    5: "✅",  # Solved
-                }
-                emoji = status_emoji.get(api_status, "⚪")
+                # Проверяем, есть ли тикет в БД
+                stored = known.get(glpi._parse_id(glpi_id))
+                ticket_scheduler.observe(glpi._parse_id(glpi_id), snapshot,
+                                         changed=stored is not None and stored['fingerprint'] != fingerprint)
+                if stored is None:
+                    changed.append((ticket, None, []))
+                    continue
+                if stored['fingerprint'] == fingerprint:
+                    continue
                 
-                # Экранируем данные
-                safe_title = html.escape(str(title))
-                safe_location = html.escape(str(location_name))
-                safe_requester = html.escape(str(requester_name))
-                safe_technician = html.escape(str(technician_name)) if technician_name else ""
-
-                priority_names = {
-                    1: "Очень низкий", 2: "Низкий", 3: "Средний",
-                    4: "Высокий", 5: "Очень высокий", 6: "Критический"
-                }
-
-                if row is None:
-                    # Проверяем: не был ли этот тикет уже уведомлён через согласование
-                    if glpi_id in glpi.notified_ticket_ids:
-                        # Тикет уже получил уведомление "ТРЕБУЕТСЯ СОГЛАСОВАНИЕ"
-                        # Записываем в БД тихо, без повторного уведомления
-                        cursor.execute(
-                            "INSERT INTO tickets (glpi_id, status, title) VALUES (?, ?, ?)",
-                            (glpi_id, api_status, title)
-                        )
-                        conn.commit()
-                        continue
-                    
-                    # Новый тикет (без согласования) — отправляем уведомление
-                    priority_name = priority_names.get(priority, f"Уровень {priority}")
-                    date_str = str(date_creation)[:16]
-
-                    assignee_line = f"\n👷 <b>Кому:</b> {safe_technician}" if safe_technician else ""
-                    desc_block = f"\n📝 <b>Описание:</b>\n<i>{clean_content}</i>" if clean_content else ""
-
-                    msg = (
-                        f"🆕 <b>НОВАЯ ЗАЯВКА #{glpi_id}</b>\n\n"
-                        f"📋 {safe_title}\n\n"
-                        f"👤 <b>От кого:</b> {safe_requester}{assignee_line}"
-                        f"{desc_block}\n\n"
-                        f"📍 <b>Местоположение:</b> {safe_location}\n\n"
-                        f"📅 <b>Создано:</b> {date_str}\n"
-                        f"⚡ <b>Приоритет:</b> {priority_name}\n"
-                        f"📊 <b>Статус:</b> {get_status_name(api_status)}"
-                    )
-
-                    kb = InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(
-                            text="🔗 Открыть в GLPI",
-                            url=f"{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}"
-                        )]
-                    ])
-
-                    # Отправка уведомления о новом тикете директору
-                    try:
-                        await bot.send_message(Config.ADMIN_ID, msg, parse_mode="HTML", reply_markup=kb)
-                        logger.info(f"✅ Уведомление о новом тикете #{glpi_id} отправлено директору")
-                        await asyncio.sleep(0.5)  # Telegram flood control
-                    except Exception as e:
-                        logger.error(f"❌ Не удалось отправить уведомление о тикете #{glpi_id}: {e}")
-
-                    # Сохраняем в БД
-                    cursor.execute(
-                        "INSERT INTO tickets (glpi_id, status, title) VALUES (?, ?, ?)",
-                        (glpi_id, api_status, title)
-                    )
-                    conn.commit()
-                    new_count += 1
-                    
+                if stored['fingerprint'] is None:
+                    # Запись до появления отпечатков: сравнить можно только статус
+                    fields = ["status"] if stored['status'] != api_status else []
                 else:
-                    db_status = row[0]
-                    if db_status != api_status:
-                        # Изменение статуса — полный контекст
-                        old_name = get_status_name(db_status)
-                        new_name = get_status_name(api_status)
-
-                        # Получаем полные данные тикета
-                        full_ticket = await glpi.get_ticket_details(glpi_id)
-                        if not full_ticket:
-                            full_ticket = ticket
-
-                        # Кто изменил
-                        updater_id = full_ticket.get('users_id_lastupdater', 0)
-                        last_updater_name = await glpi._get_user_name(updater_id) if updater_id else "Неизвестно"
-                        safe_updater = html.escape(str(last_updater_name))
-
-                        # Emoji для нового статуса
-                        status_emoji_map = {1: "🆕", 2: "🔧", 3: "📅", 4: "⏸️", 5: "✅", 6: "🔒"}
-                        status_hdr_emoji = status_emoji_map.get(api_status, "🔄")
-
-                        # Назначение (всегда)
-                        assignee = await glpi.get_ticket_technician(glpi_id)
-                        assignee_line = f"\n🔧 <b>Назначена:</b> {html.escape(assignee)}" if assignee else ""
-
-                        # Pending согласования
-                        validation_line = ""
-                        try:
-                            validations = await glpi.get_ticket_validations(glpi_id)
-                            if validations:
-                                pending = [v for v in validations if int(v.get('status', 0)) in (1, 2)]
-                                if pending:
-                                    uid_set = list({int(v['users_id_validate']) for v in pending if v.get('users_id_validate')})
-                                    names = []
-                                    for uid in uid_set[:2]:
-                                        n = await glpi._get_user_name(uid)
-                                        if n:
-                                            names.append(n)
-                                    if names:
-                                        escaped = [html.escape(n) for n in names]
-                                        validation_line = f"\n⏳ <b>На согласовании у:</b> {', '.join(escaped)}"
-                        except Exception:
-                            pass
-
-                        # Решение / комментарий к смене статуса
-                        solution_block = ""
-
-                        # Ищем followup/решение, добавленные вместе со сменой статуса (±2 мин от date_mod)
-                        # Окно нужно, т.к. между опросами могло произойти НЕСКОЛЬКО смен статуса подряд
-                        # (например 2→5 с решением, затем сразу 5→3 при отклонении решения) — бот видит
-                        # только итоговый переход, поэтому решение может лежать в ITILSolution, а не в
-                        # ITILFollowup, даже если итоговый статус не 5/6.
-                        date_mod = full_ticket.get('date_mod', '')
-                        mod_time = None
-                        window = timedelta(minutes=2)
-                        if date_mod:
-                            try:
-                                mod_time = datetime.strptime(date_mod, "%Y-%m-%d %H:%M:%S")
-                            except ValueError:
-                                mod_time = None
-
-                        all_followups = await glpi.get_ticket_followups(glpi_id)
-                        recent_followups = []
-                        if mod_time:
-                            for fu in all_followups:
-                                fu_date = fu.get('date_creation', '')
-                                if fu_date:
-                                    try:
-                                        fu_time = datetime.strptime(fu_date, "%Y-%m-%d %H:%M:%S")
-                                        if abs((fu_time - mod_time).total_seconds()) <= window.total_seconds():
-                                            recent_followups.append(fu)
-                                    except ValueError:
-                                        pass
-
-                        all_solutions = await glpi.get_ticket_solutions(glpi_id)
-                        recent_solutions = []
-                        if mod_time:
-                            for sol in all_solutions:
-                                sol_date = sol.get('date_creation', '')
-                                if sol_date:
-                                    try:
-                                        sol_time = datetime.strptime(sol_date, "%Y-%m-%d %H:%M:%S")
-                                        if abs((sol_time - mod_time).total_seconds()) <= window.total_seconds():
-                                            recent_solutions.append(sol)
-                                    except ValueError:
-                                        pass
-
-                        if api_status in [5, 6]:
-                            sol_data = await glpi._get_ticket_solution(glpi_id)
-                            if sol_data and sol_data["content"]:
-                                sol_user = html.escape(sol_data["user_name"])
-                                solution_block = f"\n\n💡 <b>Решение ({sol_user}):</b>\n<i>{sol_data['content'][:500]}</i>"
-                            elif recent_followups:
-                                # Показываем ВСЕ комментарии, добавленные вместе со сменой статуса
-                                fu_lines = []
-                                for fu in recent_followups:
-                                    if fu.get('content'):
-                                        fu_user = html.escape(fu['user_name'])
-                                        fu_lines.append(f"• <i>{fu['content'][:500]}</i> ({fu_user})")
-                                if fu_lines:
-                                    label = "Комментарий" if len(fu_lines) == 1 else "Комментарии"
-                                    solution_block = f"\n\n💬 <b>{label}:</b>\n" + "\n".join(fu_lines)
-                            else:
-                                fu_data = await glpi._get_ticket_followup(glpi_id)
-                                if fu_data and fu_data["content"]:
-                                    fu_user = html.escape(fu_data["user_name"])
-                                    solution_block = f"\n\n💬 <b>Комментарий ({fu_user}):</b>\n<i>{fu_data['content'][:500]}</i>"
-                        else:
-                            if recent_solutions:
-                                last_sol = max(recent_solutions, key=lambda x: x.get('date_creation', ''))
-                                if last_sol.get('content'):
-                                    sol_user = html.escape(last_sol['user_name'])
-                                    solution_block = f"\n\n💡 <b>Решение ({sol_user}):</b>\n<i>{last_sol['content'][:500]}</i>"
-                            elif recent_followups:
-                                # Показываем ВСЕ комментарии, добавленные вместе со сменой статуса
-                                fu_lines = []
-                                for fu in recent_followups:
-                                    if fu.get('content'):
-                                        fu_user = html.escape(fu['user_name'])
-                                        fu_lines.append(f"• <i>{fu['content'][:500]}</i> ({fu_user})")
-                                if fu_lines:
-                                    label = "Комментарий" if len(fu_lines) == 1 else "Комментарии"
-                                    solution_block = f"\n\n💬 <b>{label}:</b>\n" + "\n".join(fu_lines)
-                            else:
-                                fu_data = await glpi._get_ticket_followup(glpi_id)
-                                if fu_data and fu_data["content"]:
-                                    fu_user = html.escape(fu_data["user_name"])
-                                    solution_block = f"\n\n💬 <b>Комментарий ({fu_user}):</b>\n<i>{fu_data['content'][:500]}</i>"
-
-                        # Задачи (ITILTask)
-                        # GLPI Planning class constants (inc/planning.class.php): только 3 значения, не 5!
-                        TASK_STATUS = {0: 'ℹ️', 1: '⬜', 2: '✅'}
-                        tasks_block = ""
-                        try:
-                            tasks = await glpi.get_ticket_tasks(glpi_id)
-                            if tasks:
-                                task_lines = []
-                                for t in tasks:
-                                    t_status = int(t.get('state', 0))
-                                    t_emoji = TASK_STATUS.get(t_status, '❓')
-                                    t_text = glpi.clean_html_to_text(t.get('content', ''))
-                                    if len(t_text) > 100:
-                                        t_text = t_text[:100] + '...'
-                                    t_tech = ""
-                                    t_tech_id = t.get('users_id_tech')
-                                    if t_tech_id:
-                                        tech_name = await glpi._get_user_name(int(t_tech_id))
-                                        if tech_name:
-                                            t_tech = f" → {html.escape(tech_name)}"
-                                    t_time = ""
-                                    actiontime = t.get('actiontime', 0)
-                                    if actiontime and int(actiontime) > 0:
-                                        total_sec = int(actiontime)
-                                        hours, remainder = divmod(total_sec, 3600)
-                                        minutes, _ = divmod(remainder, 60)
-                                        t_time = f" ⏱ {hours}ч {minutes}м"
-                                    t_dates = ""
-                                    ds = t.get('date_start', '')
-                                    de = t.get('date_end', '')
-                                    if ds and de:
-                                        t_dates = f" ({ds[-8:-3]} → {de[-8:-3]})"
-                                    elif ds:
-                                        t_dates = f" (с {ds[-8:-3]})"
-                                    task_lines.append(f"  {t_emoji} {html.escape(t_text)}{t_tech}{t_time}{t_dates}")
-                                if task_lines:
-                                    tasks_block = "\n\n📂 <b>Задачи:</b>\n" + "\n".join(task_lines)
-                        except Exception:
-                            pass
-
-                        # "Других изменений нет"
-                        changes_line = ""
-                        if not solution_block and not assignee_line and not validation_line and not tasks_block:
-                            changes_line = "\n\n🔖 Других изменений в заявке не производилось"
-
-                        msg = (
-                            f"{status_hdr_emoji} <b>Статус заявки #{glpi_id} изменён</b>\n\n"
-                            f"📋 {safe_title}\n\n"
-                            f"👤 <b>От кого:</b> {safe_requester}\n"
-                            f"📝 <b>Описание:</b>\n<i>{clean_content}</i>\n\n"
-                            f"📍 <b>Местоположение:</b> {safe_location}\n\n"
-                            f"📅 <b>Создано:</b> {date_creation[:16] if date_creation else 'N/A'}\n"
-                            f"⚡ <b>Приоритет:</b> {priority_names.get(priority, 'Неизвестно')}\n"
-                            f"📊 <b>Статус:</b> {old_name} → {new_name}"
-                            f"\n👤 <b>Кто изменил:</b> {safe_updater}"
-                            f"{assignee_line}"
-                            f"{validation_line}"
-                            f"{solution_block}"
-                            f"{tasks_block}"
-                            f"{changes_line}\n\n"
-                            f"🔗 <a href='{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}'>Открыть в GLPI</a>"
-                        )
-
-                        kb = InlineKeyboardMarkup(inline_keyboard=[
-                            [InlineKeyboardButton(
-                                text="🔗 Открыть в GLPI",
-                                url=f"{Config.GLPI_URL}/front/ticket.form.php?id={glpi_id}"
-                            )]
-                        ])
-
-                        # Отправка уведомления об изменении статуса директору
-                        try:
-                            await bot.send_message(Config.ADMIN_ID, msg, parse_mode="HTML", reply_markup=kb)
-                            logger.info(f"✅ Уведомление об изменении статуса тикета #{glpi_id} отправлено директору")
-                            await asyncio.sleep(0.5)  # Telegram flood control
-                        except Exception as e:
-                            logger.error(f"❌ Не удалось отправить уведомление об изменении тикета #{glpi_id}: {e}")
-
-                        # Обновляем статус в БД
-                        cursor.execute(
-                            "UPDATE tickets SET status = ?, title = ?, last_update = CURRENT_TIMESTAMP WHERE glpi_id = ?",
-                            (api_status, title, glpi_id)
-                        )
-                        conn.commit()
+                    fields = [f for f in TICKET_NOTIFY_FIELDS if stored[f] != snapshot[f]]
+                if fields:
+                    changed.append((ticket, stored, fields))
+                else:
+                    # Только date_mod — без уведомления и без дочитывания
+                    writes.append(ticket_row(ticket, None))
+            
+            # Фаза 2: детали только для них
+            await glpi.hydrate_tickets([ticket for ticket, _, _ in changed])
+            
+            notify = []
+            fresh = await glpi.dedup.filter_new(
+                "ticket", [glpi._parse_id(ticket.get('id')) for ticket, stored, _ in changed if stored is None])
+            for item in changed:
+                ticket, stored, _ = item
+                if stored is None and glpi._parse_id(ticket.get('id')) not in fresh:
+                    # Тикет уже получил уведомление "ТРЕБУЕТСЯ СОГЛАСОВАНИЕ" —
+                    # записываем в БД тихо, без повторного уведомления
+                    writes.append(ticket_row(ticket, ticket.get('title', 'Без названия')))
+                else:
+                    notify.append(item)
+            new_count = sum(1 for _, stored, _ in notify if stored is None)
+            
+            if Config.DIGEST_THRESHOLD and len(notify) > Config.DIGEST_THRESHOLD:
+                # Массовое изменение (сбой, закрытие пачки заявок): сводка по
+                # новым статусам вместо отдельного сообщения на каждый тикет;
+                # подробности — по кнопке (expand_digest), дочитываются тогда же
+                by_id = {glpi._parse_id(ticket.get('id')): ticket for ticket, _, _ in notify}
+                for msg, kb, key, items in build_digests(notify):
+                    messages.append(outbox_message(msg, kb))
+                    digests.append((key, json.dumps(items), time.time()))
+                    for item in items:
+                        ticket = by_id[item['id']]
+                        writes.append(ticket_row(ticket, ticket.get('title', 'Без названия')))
+                logger.info(f"📦 {len(notify)} изменений тикетов сведены в {len(digests)} сообщений-сводок")
+            else:
+                enrichments = await enrich_status_changes(notify)
+                for ticket, stored, fields in notify:
+                    rendered = await render_ticket_change(ticket, stored, fields, enrichments.get(ticket.get('id')))
+                    if rendered:
+                        messages.append(outbox_message(*rendered))
+                        logger.info(f"📮 Уведомление по тикету #{ticket.get('id')} ({', '.join(fields) or 'новый'}) поставлено в очередь")
+                    writes.append(ticket_row(ticket, ticket.get('title', 'Без названия')))
+        finally:
+            await save_ticket_changes(writes, messages, digests)
+            if messages:
+                outbox.wake()
+            # Закрытые тикеты: отметки «уже уведомляли» по ним больше не нужны
+            await glpi.dedup.expire_tickets(row[0] for row in writes if row[1] == 6)
+
+        if ticket_ids is not None:
+            return new_count
+
+        # Сдвигаем watermark только после успешной обработки всего батча
+        watermark = max((t.get('date_mod') or '' for t in tickets), default='')
+        if watermark and watermark > (await get_state("tickets_date_mod") or ''):
+            await set_state("tickets_date_mod", watermark)
+        if is_full:
+            await set_state("tickets_full_sync_at", time.time())
 
         return new_count
 
@@ -1996,16 +3735,155 @@ def get_status_name(status_code):
     }
     return status_names.get(status_code, f"Статус {status_code}")
 
+# === WEBHOOK RECEIVER ===
+class WebhookReceiver:
+    """Приём вебхуков GLPI 10.x (Ticket / TicketValidation).
+
+    Подпись — как её считает GLPI: X-GLPI-signature = HMAC-SHA256(тело +
+    X-GLPI-timestamp, WEBHOOK_SECRET); запросы без подписи, с неверной подписью
+    или устаревшей меткой времени (> WEBHOOK_MAX_SKEW) отклоняются. Тип объекта
+    берётся из пути ({WEBHOOK_PATH}/Ticket, {WEBHOOK_PATH}/TicketValidation) или
+    поля itemtype в теле.
+
+    Сам обработчик ничего не проверяет в GLPI: он лишь копит ID тикетов и будит
+    monitor_loop, который прогоняет их через тот же check_tickets()/
+    check_validations() — параллельных конвейеров и гонок за состояние в БД нет.
+    """
+
+    ITEMTYPES = ("Ticket", "TicketValidation")
+
+    def __init__(self, secret, max_skew):
+        self.secret = secret.encode()
+        self.max_skew = max_skew
+        self.ticket_ids = set()
+        self.validations = False
+        self.stats = Counter()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+
+    def verify(self, body, timestamp, signature):
+        try:
+            if abs(time.time() - int(timestamp)) > self.max_skew:
+                return False
+        except (TypeError, ValueError):
+            return False
+        expected = hmac.new(self.secret, body + timestamp.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, (signature or "").lower())
+
+    async def handle(self, request):
+        body = await request.read()
+        if not self.verify(body, request.headers.get("X-GLPI-timestamp"), request.headers.get("X-GLPI-signature")):
+            self.stats["rejected"] += 1
+            logger.warning(f"🚫 Webhook rejected: bad signature or timestamp from {request.remote}")
+            return web.Response(status=401)
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return web.Response(status=400, text="invalid JSON")
+        if not isinstance(payload, dict):
+            return web.Response(status=400, text="invalid payload")
+
+        itemtype = request.match_info.get("itemtype") or payload.get("itemtype")
+        item = payload.get("item") if isinstance(payload.get("item"), dict) else payload
+        if itemtype not in self.ITEMTYPES:
+            return web.Response(status=400, text="unsupported itemtype")
+        if itemtype == "TicketValidation":
+            ticket_id = glpi._parse_id(item.get("tickets_id"))
+            self.validations = True
+        else:
+            ticket_id = glpi._parse_id(item.get("id") or item.get("items_id"))
+        if ticket_id:
+            self.ticket_ids.add(ticket_id)
+        self.stats[itemtype] += 1
+        logger.info(f"📨 Webhook {itemtype} {payload.get('event', '')} ticket #{ticket_id}")
+        self._wakeup.set()
+        return web.json_response({"status": "accepted"}, status=202)
+
+    def drain(self):
+        """Накопленные события → (ID тикетов, были ли события согласований)"""
+        ticket_ids, validations = list(self.ticket_ids), self.validations
+        self.ticket_ids, self.validations = set(), False
+        self._wakeup.clear()
+        return ticket_ids, validations
+
+    async def wait(self, timeout):
+        """Ждать события не дольше timeout сек"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def start(self, host, port, path):
+        app = web.Application()
+        app.router.add_post(path, self.handle)
+        app.router.add_post(path + "/{itemtype}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"✅ Webhook receiver listening on {host}:{port}{path}")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+# Создаётся в main(), если задан WEBHOOK_PORT
+webhooks = None
+
 async def monitor_loop():
     """Фоновый мониторинг с supervisor pattern и exponential backoff"""
+    # Все запросы монитора к GLPI — фоновые: уступают обработчикам кнопок
+    GLPI_PRIORITY.set("background")
     attempt = 0
+    next_sweep = 0
+    # Расписание переживает рестарт: тикеты из БД — по их последнему снимку
+    try:
+        for ticket_id, state in (await load_ticket_states()).items():
+            ticket_scheduler.observe(ticket_id, state)
+    except Exception as e:
+        logger.error(f"[monitor] Failed to seed ticket scheduler: {e}")
     while True:
         try:
-            await check_validations()
-            new_tickets = await check_tickets()
-            interval = 60 if new_tickets > 0 else Config.CHECK_INTERVAL
+            # GLPI недоступен: вместо цикла с сотней заведомо неудачных запросов —
+            # дождаться паузы breaker'а и отправить один пробный запрос
+            if glpi.breaker.state != "closed":
+                delay = glpi.breaker.retry_in()
+                if delay > 0:
+                    await asyncio.sleep(min(delay, Config.CHECK_INTERVAL))
+                    continue
+                if not await glpi.probe():
+                    logger.warning(f"[monitor] GLPI still unavailable, next probe in {glpi.breaker.retry_in():.0f}s")
+                    await asyncio.sleep(max(glpi.breaker.retry_in(), 1))
+                    continue
+            # Общий опрос (согласования + новые/изменённые тикеты) — раз в
+            # CHECK_INTERVAL; между ними — плановые проверки отдельных тикетов
+            # по расписанию ticket_scheduler (горячие — часто, давние — редко).
+            # С вебхуками изменения приходят сами: опрос — лишь страховочная
+            # сверка раз в WEBHOOK_RECONCILE_INTERVAL, плановых проверок нет
+            if time.monotonic() >= next_sweep:
+                await check_validations()
+                await check_tickets()
+                logger.info(f"[monitor] GLPI client stats: {glpi.format_stats()}, scheduled tickets: {len(ticket_scheduler)}")
+                interval = Config.WEBHOOK_RECONCILE_INTERVAL if webhooks else Config.CHECK_INTERVAL
+                next_sweep = time.monotonic() + interval
+            if webhooks:
+                due, pushed_validations = webhooks.drain()
+                if pushed_validations:
+                    await check_validations()
+            else:
+                due = ticket_scheduler.pop_due()
+            if due:
+                logger.info(f"[monitor] {'Webhook' if webhooks else 'Scheduled'} check of {len(due)} tickets")
+                await check_tickets(due)
             attempt = 0  # Сброс при успешном цикле
-            await asyncio.sleep(interval)
+            delay = max(next_sweep - time.monotonic(), 1)
+            if webhooks:
+                await webhooks.wait(delay)
+                continue
+            scheduled = ticket_scheduler.next_delay()
+            if scheduled is not None:
+                delay = min(delay, scheduled)
+            await asyncio.sleep(max(delay, 1))
         except asyncio.CancelledError:
             logger.info("[supervisor] monitor_loop cancelled")
             break
@@ -2018,17 +3896,34 @@ async def monitor_loop():
 _supervised_tasks = []
 
 async def main():
-    init_db()
-    await glpi.init_session()
+    global webhooks
+    await init_db()
+    await glpi.names.load()
+    await glpi.dedup.load()
+    await glpi.restore_session()
+
+    if Config.WEBHOOK_PORT:
+        if not Config.WEBHOOK_SECRET:
+            logger.error("❌ WEBHOOK_PORT is set but WEBHOOK_SECRET is empty — webhooks disabled, polling only")
+        else:
+            receiver = WebhookReceiver(Config.WEBHOOK_SECRET, Config.WEBHOOK_MAX_SKEW)
+            try:
+                await receiver.start(Config.WEBHOOK_HOST, Config.WEBHOOK_PORT, Config.WEBHOOK_PATH)
+                webhooks = receiver
+            except OSError as e:
+                logger.error(f"❌ Webhook receiver failed to start: {e} — polling only")
     
+    # Диагностика не нужна для работы — не задерживаем старт
     logger.info("🔧 Running SearchOptions diagnostic...")
-    await glpi.diagnose_search_options()
+    _supervised_tasks.append(asyncio.create_task(glpi.diagnose_search_options()))
     
     dp.include_router(router)
     
     # Запуск фонового мониторинга с отслеживанием
     monitor_task = asyncio.create_task(monitor_loop())
     _supervised_tasks.append(monitor_task)
+    # Доставка уведомлений (в т.ч. оставшихся в outbox с прошлого запуска)
+    _supervised_tasks.append(asyncio.create_task(outbox.run()))
     
     await bot.set_my_commands([
         BotCommand(command="start", description="🏠 Главное меню"),
@@ -2048,6 +3943,13 @@ async def main():
         for task in _supervised_tasks:
             task.cancel()
         await asyncio.gather(*_supervised_tasks, return_exceptions=True)
+        if webhooks:
+            await webhooks.close()
+        # Досылаем накопленные уведомления, пока БД и сессия бота ещё открыты
+        await outbox.flush(Config.OUTBOX_FLUSH_TIMEOUT)
+        await bot.session.close()
+        await glpi.close()
+        await storage.close()
         logger.info("✅ Shutdown complete")
 
 if __name__ == "__main__":
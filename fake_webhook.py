@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный отправитель вебхуков в формате GLPI 10.x — для проверки WEBHOOK_* без GLPI.
+
+Подписывает тело так же, как GLPI: X-GLPI-signature = HMAC-SHA256(тело + timestamp).
+Секрет, порт и путь берутся из .env (WEBHOOK_SECRET, WEBHOOK_PORT, WEBHOOK_PATH).
+
+Примеры:
+    python fake_webhook.py Ticket 1234
+    python fake_webhook.py TicketValidation 1234 --validation-id 55
+    python fake_webhook.py Ticket 1234 --bad-signature   # ожидается 401
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def build_request(itemtype, ticket_id, validation_id, secret, bad_signature=False):
+    """Тело и заголовки вебхука → (body, headers)"""
+    if itemtype == "TicketValidation":
+        item = {"id": validation_id or ticket_id, "tickets_id": ticket_id, "status": 2}
+    else:
+        item = {"id": ticket_id}
+    body = json.dumps({"event": "update", "item": item}).encode()
+    timestamp = str(int(time.time()))
+    key = (secret + "x" if bad_signature else secret).encode()
+    signature = hmac.new(key, body + timestamp.encode(), hashlib.sha256).hexdigest()
+    headers = {
+        "Content-Type": "application/json",
+        "X-GLPI-timestamp": timestamp,
+        "X-GLPI-signature": signature,
+    }
+    return body, headers
+
+
+async def send(url, body, headers):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=body, headers=headers) as resp:
+            print(f"{resp.status} {await resp.text()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отправить тестовый вебхук GLPI боту")
+    parser.add_argument("itemtype", choices=["Ticket", "TicketValidation"])
+    parser.add_argument("ticket_id", type=int)
+    parser.add_argument("--validation-id", type=int, default=None)
+    parser.add_argument("--url", default=None, help="по умолчанию http://127.0.0.1:$WEBHOOK_PORT$WEBHOOK_PATH")
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    parser.add_argument("--bad-signature", action="store_true", help="подписать неверным ключом")
+    args = parser.parse_args()
+
+    path = os.getenv("WEBHOOK_PATH", "/glpi/webhook").rstrip('/')
+    url = args.url or f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT', '8080')}{path}"
+    body, headers = build_request(args.itemtype, args.ticket_id, args.validation_id,
+                                  args.secret, args.bad_signature)
+    asyncio.run(send(f"{url}/{args.itemtype}", body, headers))
+
+
+if __name__ == "__main__":
+    main()